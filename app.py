@@ -1,37 +1,111 @@
 # Serve PDF files from the tmp directory
-from flask import send_from_directory, send_file, Flask, request, render_template, jsonify
 import os
+GEVENT_ENABLED = os.getenv("PPTGEN_GEVENT") == "1"
+if GEVENT_ENABLED:
+    # Must run before anything imports socket/ssl/threading
+    from gevent import monkey
+    monkey.patch_all()
+
+from flask import send_from_directory, send_file, Flask, request, render_template, jsonify, Response
+import re
+import posixpath
+import zipfile
 import tempfile
 import uuid
 import logging
 import threading
+import asyncio
+import base64
+import atexit
+import hashlib
+import json
 import requests
-from pathlib import Path
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import shutil
 import time
+import copy
+from collections import OrderedDict
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from flask.json.provider import DefaultJSONProvider
 from werkzeug.utils import secure_filename
-from src.llm_providers import GeminiProvider, OpenAIProvider
-from src.ppt_analyzer import PowerPointAnalyzer
-from src.slide_generator import SlideGenerator
-from src.utils import validate_file, cleanup_temp_files
-import convertapi
+from src.utils import validate_file, cleanup_temp_files, has_pptx_signature
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON provider that serializes responses with orjson"""
+
+    def dumps(self, obj, **kwargs):
+        # Same knobs as DefaultJSONProvider.dumps; orjson never escapes non-ASCII (still valid JSON)
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+if orjson is not None:
+    app.json = ORJSONProvider(app)
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
 app.config['UPLOAD_FOLDER'] = tempfile.gettempdir()
+# send_file already streams through the server's wsgi.file_wrapper (sendfile(2) under
+# gunicorn); behind nginx/Apache, USE_X_SENDFILE=1 hands the transfer to the proxy instead
+app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', '0') == '1'
+
+# Cache lifetime (seconds) for generated pptx/pdf downloads
+DOWNLOAD_MAX_AGE = 300
+
+# Placeholder types that hold body text
+_CONTENT_PH_RE = re.compile(r'CONTENT|BODY|TEXT|OBJECT')
 
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'pptx', 'potx'}
+_ALLOWED_RE = re.compile(r'.*\.(%s)\Z' % '|'.join(sorted(ALLOWED_EXTENSIONS)), re.IGNORECASE | re.DOTALL).match
 
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
-# Set your API key at the top of the file
-convertapi.api_credentials = os.getenv("CLOUDCONVERT_API_KEY", "")
+    return _ALLOWED_RE(filename) is not None
+
+# Heavy modules are imported on first use to keep serverless cold starts cheap
+_providers = {}
+
+def _get_provider_class(name):
+    """Import and cache an LLM provider class from src.llm_providers"""
+    provider_cls = _providers.get(name)
+    if provider_cls is None:
+        from src import llm_providers
+        provider_cls = _providers[name] = getattr(llm_providers, name)
+    return provider_cls
+
+# Shared keep-alive session for ConvertAPI so successive conversions reuse TLS connections
+_http = requests.Session()
+_http.mount('https://', HTTPAdapter(pool_connections=8, pool_maxsize=16,
+                                    max_retries=Retry(total=3, backoff_factor=0.3)))
+_convertapi_configured = False
+
+def _configure_convertapi(convertapi):
+    """Point the ConvertAPI client at the shared session (once per process)"""
+    global _convertapi_configured
+    if _convertapi_configured:
+        return
+    convertapi.api_credentials = os.getenv("CLOUDCONVERT_API_KEY", "")
+    client = getattr(convertapi, 'client', None)
+    if client is not None and isinstance(getattr(client, 'session', None), requests.Session):
+        client.session = _http
+    else:
+        logger.debug("ConvertAPI client does not expose a session; using its default transport")
+    _convertapi_configured = True
 
 def convert_pdf_bg(session_dir):
     pptx_path = os.path.join(session_dir, 'output.pptx')
@@ -39,10 +113,14 @@ def convert_pdf_bg(session_dir):
 
     if not os.path.exists(pptx_path):
         logger.error(f"PPTX not found: {pptx_path}")
-        return
+        return False
 
     try:
+        import convertapi
+        _configure_convertapi(convertapi)
+
         logger.info("Starting ConvertAPI PPTX → PDF conversion...")
+        _push_pdf_progress(os.path.basename(session_dir), 'converting')
 
         # Run conversion
         result = convertapi.convert(
@@ -54,38 +132,243 @@ def convert_pdf_bg(session_dir):
         # Save converted PDF
         result.file.save(pdf_path)
         logger.info(f"PDF saved: {pdf_path}")
+        return True
 
     except Exception as e:
         logger.error(f"Exception during ConvertAPI conversion: {e}")
+        return False
+
+
+# Bounded pool for background PDF conversions, plus a registry of in-flight jobs
+PDF_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv("PDF_WORKERS", 4)), thread_name_prefix="pdf")
+PDF_JOBS = {}  # session_id -> (Future, submitted_at)
+PDF_JOBS_LOCK = threading.Lock()
+PDF_JOB_MAX_AGE = 120  # seconds, matches the tmp session lifetime
+# Latest conversion stage per session for /api/progress; every stream re-reads it, so
+# any number of tabs or reconnects can follow one job
+PDF_PROGRESS = {}  # session_id -> (sequence number, progress event)
+PDF_PROGRESS_CHANGED = threading.Condition(PDF_JOBS_LOCK)
+
+atexit.register(PDF_EXECUTOR.shutdown, wait=False)
+
+def _evict_old_pdf_jobs(now=None):
+    """Drop finished jobs older than PDF_JOB_MAX_AGE from the registry"""
+    now = now or time.time()
+    with PDF_JOBS_LOCK:
+        expired = [sid for sid, (fut, submitted_at) in PDF_JOBS.items()
+                   if fut.done() and now - submitted_at > PDF_JOB_MAX_AGE]
+        for sid in expired:
+            del PDF_JOBS[sid]
+            PDF_PROGRESS.pop(sid, None)
+        if expired:
+            PDF_PROGRESS_CHANGED.notify_all()
+
+def _push_pdf_progress(session_id, stage, **extra):
+    """Publish a conversion stage to anyone listening on /api/progress"""
+    with PDF_PROGRESS_CHANGED:
+        seq = PDF_PROGRESS[session_id][0] + 1 if session_id in PDF_PROGRESS else 1
+        PDF_PROGRESS[session_id] = (seq, {'stage': stage, **extra})
+        PDF_PROGRESS_CHANGED.notify_all()
+
+# Optional asyncio converter: one event-loop thread multiplexes all in-flight
+# conversions over aiohttp instead of holding a pool thread per job.
+# Enable with PDF_CONVERTER=async (requires aiohttp). Not used under gevent: an asyncio
+# loop in a monkey-patched thread is unsupported, and there the pool's workers are
+# already greenlets.
+CONVERTAPI_URL = "https://v2.convertapi.com/convert/pptx/to/pdf"
+PDF_ASYNC_ENABLED = os.getenv("PDF_CONVERTER", "thread") == "async" and not GEVENT_ENABLED
+if GEVENT_ENABLED and os.getenv("PDF_CONVERTER") == "async":
+    logger.warning("PDF_CONVERTER=async is ignored under gevent; using the greenlet-backed pool")
+_pdf_loop = None
+_pdf_loop_lock = threading.Lock()
+
+def _get_pdf_loop():
+    """Start the conversion event loop thread on first use"""
+    global _pdf_loop
+    with _pdf_loop_lock:
+        if _pdf_loop is None:
+            _pdf_loop = asyncio.new_event_loop()
+            threading.Thread(target=_pdf_loop.run_forever, name="pdf-loop", daemon=True).start()
+    return _pdf_loop
+
+async def _convert_pdf_async(session_dir):
+    """Convert output.pptx to output.pdf through the ConvertAPI REST endpoint"""
+    import aiohttp
 
+    pptx_path = os.path.join(session_dir, 'output.pptx')
+    pdf_path = os.path.join(session_dir, 'output.pdf')
+
+    if not os.path.exists(pptx_path):
+        logger.error(f"PPTX not found: {pptx_path}")
+        return False
+
+    try:
+        logger.info("Starting async ConvertAPI PPTX → PDF conversion...")
+        _push_pdf_progress(os.path.basename(session_dir), 'converting')
+        headers = {'Authorization': f"Bearer {os.getenv('CLOUDCONVERT_API_KEY', '')}"}
+        timeout = aiohttp.ClientTimeout(total=300)
+        with open(pptx_path, 'rb') as f:
+            form = aiohttp.FormData()
+            form.add_field('File', f, filename='output.pptx')
+            async with aiohttp.ClientSession(timeout=timeout) as http:
+                async with http.post(CONVERTAPI_URL, data=form, headers=headers) as resp:
+                    resp.raise_for_status()
+                    result = await resp.json()
+
+        file_data = result['Files'][0]['FileData']
+        tmp_path = f"{pdf_path}.part"
+        with open(tmp_path, 'wb') as out:
+            out.write(base64.b64decode(file_data))
+        os.replace(tmp_path, pdf_path)
+        logger.info(f"PDF saved: {pdf_path}")
+        return True
+
+    except Exception as e:
+        logger.error(f"Exception during async ConvertAPI conversion: {e}")
+        return False
 
 # Run conversion in background
 def start_pdf_conversion(session_dir):
-    threading.Thread(target=convert_pdf_bg, args=(session_dir,), daemon=True).start()
-
-@app.route('/')
-def index():
-    """Render the main page and clean up old tmp session directories"""
+    session_id = os.path.basename(session_dir)
+    _evict_old_pdf_jobs()
+    _push_pdf_progress(session_id, 'queued')
+    if PDF_ASYNC_ENABLED:
+        future = asyncio.run_coroutine_threadsafe(_convert_pdf_async(session_dir), _get_pdf_loop())
+    else:
+        future = PDF_EXECUTOR.submit(convert_pdf_bg, session_dir)
+    with PDF_JOBS_LOCK:
+        PDF_JOBS[session_id] = (future, time.time())
+    future.add_done_callback(lambda f: _push_pdf_progress(
+        session_id, 'done', ready=f.exception() is None and f.result() is True))
+
+UPLOAD_COPY_BUFFER = 1024 * 1024  # 1 MiB
+
+def _save_upload(file, path):
+    """Stream an uploaded file to disk with a large buffer, returning its SHA-256"""
+    h = hashlib.sha256()
+    with open(path, 'wb') as out:
+        while True:
+            buf = file.stream.read(UPLOAD_COPY_BUFFER)
+            if not buf:
+                break
+            h.update(buf)
+            out.write(buf)
+    return h.hexdigest()
+
+# Per-session copy of the slide structure so a retry can skip the LLM call
+STRUCTURE_FILENAME = 'structure.json'
+_SESSION_ID_RE = re.compile(r'pptgen-[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\Z')
+
+def _save_slide_structure(session_dir, slide_structure):
+    """Write slide_structure to session_dir/structure.json, returning True on success"""
+    structure_path = os.path.join(session_dir, STRUCTURE_FILENAME)
+    try:
+        tmp_path = f"{structure_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(slide_structure, f)
+        os.replace(tmp_path, structure_path)
+        return True
+    except (OSError, TypeError) as e:
+        logger.warning(f"Could not persist slide structure: {e}")
+        return False
+
+def _load_slide_structure(session_id):
+    """Load the structure saved by an earlier session, or None if it is unavailable"""
+    if not _SESSION_ID_RE.match(session_id):
+        return None
+    structure_path = os.path.join(tempfile.gettempdir(), session_id, STRUCTURE_FILENAME)
+    try:
+        with open(structure_path, 'r', encoding='utf-8') as f:
+            slide_structure = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return slide_structure if isinstance(slide_structure, list) else None
+
+# In-process cache of template analysis results keyed by template SHA-256
+ANALYZER_CACHE_SIZE = 16
+ANALYZER_CACHE_TTL = 86400  # seconds
+_analyzer_cache = OrderedDict()  # template_hash -> (template_info without presentation_object, cached_at)
+_analyzer_cache_lock = threading.Lock()
+
+def analyze_template_cached(analyzer, template_path, template_hash):
+    """Analyze a template, reusing the result for byte-identical uploads"""
+    now = time.time()
+    with _analyzer_cache_lock:
+        entry = _analyzer_cache.get(template_hash)
+        if entry is not None and now - entry[1] <= ANALYZER_CACHE_TTL:
+            _analyzer_cache.move_to_end(template_hash)
+            cached_info = entry[0]
+        else:
+            cached_info = None
 
-    tmp_root = Path(tempfile.gettempdir())
+    if cached_info is not None:
+        logger.info(f"Template analysis cache hit: {template_hash[:12]}")
+        from pptx import Presentation
+        template_info = copy.deepcopy(cached_info)
+        template_info['presentation_object'] = Presentation(template_path)
+        return template_info
+
+    template_info = analyzer.analyze_template(template_path)
+    cacheable = {k: v for k, v in template_info.items() if k != 'presentation_object'}
+    with _analyzer_cache_lock:
+        _analyzer_cache[template_hash] = (copy.deepcopy(cacheable), now)
+        _analyzer_cache.move_to_end(template_hash)
+        while len(_analyzer_cache) > ANALYZER_CACHE_SIZE:
+            _analyzer_cache.popitem(last=False)
+    return template_info
+
+# Background janitor that removes expired tmp session directories
+SESSION_MAX_AGE = 120  # seconds
+JANITOR_INTERVAL = 60  # seconds
+_janitor_started = False
+_janitor_lock = threading.Lock()
+
+def _sweep_tmp_sessions():
+    """Delete pptgen-* session directories older than SESSION_MAX_AGE"""
     now = time.time()
-    max_age = 120  # seconds
 
-    for session_dir in tmp_root.iterdir():
-        if session_dir.is_dir() and session_dir.name.startswith("pptgen-"):
+    # DirEntry caches the file type from the directory read, saving a stat per entry
+    with os.scandir(tempfile.gettempdir()) as entries:
+        for entry in entries:
+            if not entry.name.startswith("pptgen-"):
+                continue
             try:
-                mtime = session_dir.stat().st_mtime
-                if now - mtime > max_age:
-                    shutil.rmtree(session_dir)
-                    logger.info(f"Deleted old tmp dir: {session_dir}")
+                if entry.is_dir(follow_symlinks=False) and now - entry.stat(follow_symlinks=False).st_mtime > SESSION_MAX_AGE:
+                    shutil.rmtree(entry.path)
+                    logger.info(f"Deleted old tmp dir: {entry.path}")
             except Exception as e:
-                logger.warning(f"Failed to delete old tmp dir {session_dir}: {e}")
+                logger.warning(f"Failed to delete old tmp dir {entry.path}: {e}")
+
+    _evict_old_pdf_jobs(now)
+
+def _janitor_loop():
+    while True:
+        time.sleep(JANITOR_INTERVAL)
+        try:
+            _sweep_tmp_sessions()
+        except Exception as e:
+            logger.warning(f"Tmp janitor sweep failed: {e}")
+
+@app.before_request
+def _start_janitor():
+    global _janitor_started
+    if _janitor_started:
+        return
+    with _janitor_lock:
+        if not _janitor_started:
+            threading.Thread(target=_janitor_loop, name="tmp-janitor", daemon=True).start()
+            _janitor_started = True
 
+@app.route('/')
+def index():
+    """Render the main page"""
     return render_template("index.html")
 
 @app.route('/api/generate', methods=['POST'])
 def generate_presentation():
     """Main endpoint to generate PowerPoint presentation"""
+    template_path = output_path = session_dir = None
+    structure_saved = False
     try:
         # Validate request
         if 'template' not in request.files:
@@ -105,17 +388,20 @@ def generate_presentation():
         ai_provider = request.form.get('ai_provider', 'gemini').lower().strip()
         ai_model = request.form.get('ai_model', '').strip()
         num_slides = request.form.get('num_slides', '').strip()
+        regenerate_session_id = request.form.get('regenerate_session_id', '').strip()
+        # Reuse the slide structure from an earlier session instead of calling the LLM again
+        saved_structure = _load_slide_structure(regenerate_session_id) if regenerate_session_id else None
         # Always reuse images from template (made mandatory)
         reuse_images = True
 
         # --- TEXT CHARACTER LIMITATION ---
         MAX_TEXT_CHARS = 60000
-        if not text_content:
+        if not text_content and saved_structure is None:
             return jsonify({'error': 'Text content is required'}), 400
         if len(text_content) > MAX_TEXT_CHARS:
             text_content = text_content[:MAX_TEXT_CHARS]
 
-        if not api_key:
+        if not api_key and saved_structure is None:
             return jsonify({'error': 'API key is required'}), 400
 
         if ai_provider not in ['gemini', 'openai', 'aipipe']:
@@ -139,31 +425,34 @@ def generate_presentation():
         # Save uploaded template
         filename = secure_filename(file.filename)
         template_path = os.path.join(session_dir, f"template_{filename}")
-        file.save(template_path)
+        template_hash = _save_upload(file, template_path)
 
-        # Validate the PowerPoint file
-        if not validate_file(template_path):
+        # Validate the PowerPoint file (header check first so junk never reaches python-pptx)
+        if not has_pptx_signature(template_path) or not validate_file(template_path):
             os.remove(template_path)
             return jsonify({'error': 'Invalid PowerPoint file'}), 400
 
         # Initialize components
+        from src.ppt_analyzer import PowerPointAnalyzer
+        from src.slide_generator import SlideGenerator
         analyzer = PowerPointAnalyzer()
         generator = SlideGenerator()
 
         # Initialize the appropriate LLM provider
-        if ai_provider == 'gemini':
+        if saved_structure is not None:
+            llm_provider = model_name = None
+        elif ai_provider == 'gemini':
             model_name = ai_model if ai_model else 'gemini-2.5-pro'
-            llm_provider = GeminiProvider(api_key, model_name)
+            llm_provider = _get_provider_class('GeminiProvider')(api_key, model_name)
         elif ai_provider == 'openai':
             model_name = ai_model if ai_model else 'gpt-4o-mini'
             try:
-                llm_provider = OpenAIProvider(api_key, model_name)
+                llm_provider = _get_provider_class('OpenAIProvider')(api_key, model_name)
             except ImportError as e:
                 return jsonify({'error': 'OpenAI library not available. Please install with: pip install openai'}), 400
         elif ai_provider == 'aipipe':
             model_name = ai_model if ai_model else 'openai/gpt-4o-mini'
-            from src.llm_providers import AIPipeProvider
-            llm_provider = AIPipeProvider(api_key, model_name)
+            llm_provider = _get_provider_class('AIPipeProvider')(api_key, model_name)
         else:
             return jsonify({'error': f'Unsupported AI provider: {ai_provider}'}), 400
 
@@ -171,7 +460,7 @@ def generate_presentation():
         logger.info(f"Processing presentation for session {session_id} using {ai_provider}")
 
         # Step 1: Analyze template
-        template_info = analyzer.analyze_template(template_path)
+        template_info = analyze_template_cached(analyzer, template_path, template_hash)
 
         # Define output path in session dir
         output_path = os.path.join(session_dir, 'output.pptx')
@@ -184,17 +473,21 @@ def generate_presentation():
         if template_info and 'existing_slides' in template_info:
             for slide in template_info.get('existing_slides', []):
                 placeholders = slide.get('placeholders', [])
-                content_phs = [p for p in placeholders 
-                             if any(x in str(p.get('type', '')).upper() 
-                                   for x in ['CONTENT', 'BODY', 'TEXT', 'OBJECT'])]
+                content_phs = [p for p in placeholders
+                               if _CONTENT_PH_RE.search(str(p.get('type', '')).upper())]
                 if len(content_phs) > max_content_placeholders:
                     max_content_placeholders = len(content_phs)
                 if len(content_phs) > 2:  # More than 2 content areas means multi-placeholder
                     use_robust = True
+                    break
 
         # --- LLM GENERATION AND SLIDE COUNT ENFORCEMENT ---
-        if use_robust:
-            logger.info(f"Detected multi-placeholder template (max {max_content_placeholders} content areas), using robust pipeline")
+        if saved_structure is not None:
+            logger.info(f"Reusing slide structure from session {regenerate_session_id}")
+            structure_saved = _save_slide_structure(session_dir, saved_structure)
+            generator.create_presentation(saved_structure, template_info, output_path, use_robust_pipeline=False, reuse_images=reuse_images)
+        elif use_robust:
+            logger.info(f"Detected multi-placeholder template ({max_content_placeholders}+ content areas), using robust pipeline")
             try:
                 from src.robust_pipeline import RobustSlidePipeline
                 pipeline = RobustSlidePipeline(llm_provider)
@@ -211,10 +504,12 @@ def generate_presentation():
             except Exception as e:
                 logger.warning(f"Robust pipeline failed: {e}, falling back to standard generation")
                 slide_structure = llm_provider.parse_text_to_slides(text_content, guidance, template_info, num_slides=target_num_slides)
+                structure_saved = _save_slide_structure(session_dir, slide_structure)
                 generator.create_presentation(slide_structure, template_info, output_path, use_robust_pipeline=False, reuse_images=reuse_images)
         else:
             logger.info("Using standard generation pipeline")
             slide_structure = llm_provider.parse_text_to_slides(text_content, guidance, template_info, num_slides=target_num_slides)
+            structure_saved = _save_slide_structure(session_dir, slide_structure)
             generator.create_presentation(slide_structure, template_info, output_path, use_robust_pipeline=False, reuse_images=reuse_images)
 
         # Clean up template file
@@ -233,17 +528,166 @@ def generate_presentation():
     except Exception as e:
         logger.error(f"Error generating presentation: {str(e)}")
         # Clean up any temp files
-        cleanup_temp_files(locals().get('template_path'), locals().get('output_path'))
-        return jsonify({'error': f'Failed to generate presentation: {str(e)}'}), 500
+        cleanup_temp_files(template_path, output_path)
+        error = {'error': f'Failed to generate presentation: {str(e)}'}
+        if structure_saved:
+            # Keep structure.json so a retry can pass regenerate_session_id and skip the LLM
+            error['session_id'] = session_id
+        elif session_dir and os.path.isdir(session_dir):
+            shutil.rmtree(session_dir, ignore_errors=True)
+        return jsonify(error), 500
     
 # Endpoint to check if PDF is ready for preview
 @app.route('/api/pdf_status/<session_id>')
 def pdf_status(session_id):
+    with PDF_JOBS_LOCK:
+        job = PDF_JOBS.get(session_id)
+    if job is not None:
+        future = job[0]
+        return jsonify({'ready': future.done() and future.exception() is None and future.result() is True})
+
+    # Fall back to the filesystem for jobs started before a restart
     session_dir = os.path.join(tempfile.gettempdir(), session_id)
     pdf_path = os.path.join(session_dir, 'output.pdf')
     ready = os.path.exists(pdf_path)
     return jsonify({'ready': ready})
 
+PROGRESS_TIMEOUT = 120  # seconds without an event before the stream gives up
+PROGRESS_FS_POLL_INTERVAL = 1.5  # seconds between output.pdf checks for jobs of other workers
+
+def _job_progress_stream(session_id):
+    """Yield the session's conversion events until 'done', re-reading the shared state"""
+    seen = 0
+    while True:
+        with PDF_PROGRESS_CHANGED:
+            PDF_PROGRESS_CHANGED.wait_for(
+                lambda: PDF_PROGRESS.get(session_id, (0, None))[0] != seen, timeout=PROGRESS_TIMEOUT)
+            entry = PDF_PROGRESS.get(session_id)
+        if entry is None or entry[0] == seen:
+            # Timed out or evicted: end without 'done' so the client falls back to polling
+            return
+        seen, msg = entry
+        yield f"data: {json.dumps(msg)}\n\n"
+        if msg.get('stage') == 'done':
+            return
+
+def _filesystem_progress_stream(session_id):
+    """
+    Wait for output.pdf of a job this process doesn't know about
+    
+    The conversion may be running on another worker or instance (or the job
+    predates a restart), so only a PDF on disk proves it finished; without one
+    the stream ends without 'done' and the client falls back to polling.
+    """
+    if not _SESSION_ID_RE.match(session_id):
+        return
+    pdf_path = os.path.join(tempfile.gettempdir(), session_id, 'output.pdf')
+    deadline = time.monotonic() + PROGRESS_TIMEOUT
+    while not os.path.exists(pdf_path):
+        if time.monotonic() >= deadline:
+            return
+        time.sleep(PROGRESS_FS_POLL_INTERVAL)
+    yield f"data: {json.dumps({'stage': 'done', 'ready': True})}\n\n"
+
+# Server-sent events for PDF conversion progress; /api/pdf_status remains for polling clients
+@app.route('/api/progress/<session_id>')
+def pdf_progress(session_id):
+    with PDF_JOBS_LOCK:
+        known = session_id in PDF_JOBS or session_id in PDF_PROGRESS
+    stream = _job_progress_stream if known else _filesystem_progress_stream
+    return Response(stream(session_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# OOXML namespaces used when reading generated decks for preview
+_PPTX_NS = {
+    'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
+    'p': 'http://schemas.openxmlformats.org/presentationml/2006/main',
+    'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+    'rel': 'http://schemas.openxmlformats.org/package/2006/relationships',
+}
+_REL_ID_ATTR = '{%s}id' % _PPTX_NS['r']
+
+# <p:ph type="..."> values mapped to python-pptx PP_PLACEHOLDER names (default is "obj")
+_PH_TYPE_NAMES = {
+    'title': 'TITLE', 'ctrTitle': 'CENTER_TITLE', 'subTitle': 'SUBTITLE', 'body': 'BODY',
+    'obj': 'OBJECT', 'chart': 'CHART', 'tbl': 'TABLE', 'clipArt': 'CLIP_ART', 'dgm': 'ORG_CHART',
+    'media': 'MEDIA_CLIP', 'sldImg': 'SLIDE_IMAGE', 'pic': 'PICTURE', 'dt': 'DATE',
+    'ftr': 'FOOTER', 'sldNum': 'SLIDE_NUMBER', 'hdr': 'HEADER',
+}
+
+def _read_part_rels(zf, part_name):
+    """Return {rId: absolute part name} for a package part"""
+    from lxml import etree
+    base_dir, file_name = posixpath.split(part_name)
+    rels_name = posixpath.join(base_dir, '_rels', f"{file_name}.rels")
+    try:
+        root = etree.fromstring(zf.read(rels_name))
+    except KeyError:
+        return {}
+    rels = {}
+    for rel in root.findall('rel:Relationship', _PPTX_NS):
+        target = rel.get('Target', '')
+        if rel.get('TargetMode') == 'External':
+            continue
+        if target.startswith('/'):
+            rels[rel.get('Id')] = target.lstrip('/')
+        else:
+            rels[rel.get('Id')] = posixpath.normpath(posixpath.join(base_dir, target))
+    return rels
+
+_A_RUN_TAGS = ('{%s}r' % _PPTX_NS['a'], '{%s}fld' % _PPTX_NS['a'])
+_A_BREAK_TAG = '{%s}br' % _PPTX_NS['a']
+
+def _shape_text(sp):
+    """Text of a <p:sp>, matching python-pptx's shape.text (paragraphs joined by newlines)"""
+    paragraphs = []
+    for para in sp.findall('./p:txBody/a:p', _PPTX_NS):
+        parts = []
+        for node in para:
+            if node.tag in _A_RUN_TAGS:
+                parts.extend(t.text or '' for t in node.findall('a:t', _PPTX_NS))
+            elif node.tag == _A_BREAK_TAG:
+                parts.append('\v')
+        paragraphs.append(''.join(parts))
+    return '\n'.join(paragraphs)
+
+def _read_preview_slides(file_path):
+    """Yield (layout_name, [(text, placeholder_type_or_None), ...]) per slide in deck order"""
+    from lxml import etree
+    with zipfile.ZipFile(file_path) as zf:
+        pres_part = 'ppt/presentation.xml'
+        pres_rels = _read_part_rels(zf, pres_part)
+        pres_root = etree.fromstring(zf.read(pres_part))
+        layout_names = {}
+
+        for sld_id in pres_root.findall('./p:sldIdLst/p:sldId', _PPTX_NS):
+            slide_part = pres_rels.get(sld_id.get(_REL_ID_ATTR))
+            if not slide_part:
+                continue
+            slide_root = etree.fromstring(zf.read(slide_part))
+
+            layout_name = None
+            for target in _read_part_rels(zf, slide_part).values():
+                if '/slideLayouts/' in f"/{target}":
+                    if target not in layout_names:
+                        try:
+                            layout_root = etree.fromstring(zf.read(target))
+                            layout_names[target] = layout_root.find('p:cSld', _PPTX_NS).get('name', '')
+                        except Exception:
+                            layout_names[target] = None
+                    layout_name = layout_names[target]
+                    break
+
+            shapes = []
+            for sp in slide_root.findall('./p:cSld/p:spTree/p:sp', _PPTX_NS):
+                ph = sp.find('./p:nvSpPr/p:nvPr/p:ph', _PPTX_NS)
+                ph_type = None
+                if ph is not None:
+                    ph_type = _PH_TYPE_NAMES.get(ph.get('type', 'obj'), ph.get('type', 'obj').upper())
+                shapes.append((_shape_text(sp), ph_type))
+
+            yield layout_name, shapes
+
 @app.route('/api/preview/<session_id>')
 def preview_presentation(session_id):
     """Preview the generated presentation content"""
@@ -253,32 +697,26 @@ def preview_presentation(session_id):
         if not os.path.exists(file_path):
             return jsonify({'error': 'File not found or expired'}), 404
         
-        # Load the presentation to get slide info
-        from pptx import Presentation
-        pres = Presentation(file_path)
+        # Read slide text straight from the slide XML instead of building python-pptx shapes
+        slides_data = list(_read_preview_slides(file_path))
+        total_slides = len(slides_data)
         
         slides_preview = []
-        for i, slide in enumerate(pres.slides):
+        for i, (layout_name, shapes) in enumerate(slides_data):
             slide_info = {
                 'slide_number': i + 1,
                 'title': '',
                 'subtitle': '',
                 'content': [],
-                'layout_name': '',
+                'layout_name': layout_name if layout_name is not None else 'Unknown Layout',
                 'slide_type': 'content'  # default
             }
             
-            # Try to get layout name
-            try:
-                slide_info['layout_name'] = slide.slide_layout.name
-            except:
-                slide_info['layout_name'] = 'Unknown Layout'
-            
             # Determine slide type based on layout or content
             layout_name = slide_info['layout_name'].lower()
             if 'title' in layout_name and ('only' in layout_name or i == 0):
                 slide_info['slide_type'] = 'title'
-            elif i == len(pres.slides) - 1 and ('conclusion' in layout_name or 'summary' in layout_name):
+            elif i == total_slides - 1 and ('conclusion' in layout_name or 'summary' in layout_name):
                 slide_info['slide_type'] = 'conclusion'
             
             # Extract text from slide shapes, preserving hierarchy
@@ -286,34 +724,25 @@ def preview_presentation(session_id):
             content_shapes = []
             subtitle_shapes = []
             
-            for shape in slide.shapes:
-                if hasattr(shape, 'text') and shape.text.strip():
-                    text = shape.text.strip()
-                    
-                    # Check if this is a placeholder and what type
-                    if shape.is_placeholder:
-                        try:
-                            placeholder_type = str(shape.placeholder_format.type)
-                            if 'TITLE' in placeholder_type.upper():
-                                title_shapes.append(text)
-                            elif 'SUBTITLE' in placeholder_type.upper():
-                                subtitle_shapes.append(text)
-                            elif 'CONTENT' in placeholder_type.upper() or 'BODY' in placeholder_type.upper():
-                                content_shapes.append(text)
-                            else:
-                                content_shapes.append(text)
-                        except:
-                            # If we can't determine placeholder type, use heuristics
-                            if not slide_info['title'] and len(text) < 100:
-                                title_shapes.append(text)
-                            else:
-                                content_shapes.append(text)
+            for shape_text, placeholder_type in shapes:
+                text = shape_text.strip()
+                if not text:
+                    continue
+                
+                # Check if this is a placeholder and what type
+                if placeholder_type is not None:
+                    if 'TITLE' in placeholder_type:
+                        title_shapes.append(text)
+                    elif 'SUBTITLE' in placeholder_type:
+                        subtitle_shapes.append(text)
+                    else:
+                        content_shapes.append(text)
+                else:
+                    # Not a placeholder, use position and size heuristics
+                    if not slide_info['title'] and len(text) < 100:
+                        title_shapes.append(text)
                     else:
-                        # Not a placeholder, use position and size heuristics
-                        if not slide_info['title'] and len(text) < 100:
-                            title_shapes.append(text)
-                        else:
-                            content_shapes.append(text)
+                        content_shapes.append(text)
             
             # Assign the extracted text
             if title_shapes:
@@ -349,41 +778,50 @@ def download_presentation(session_id):
     file_path = os.path.join(tempfile.gettempdir(), session_id, 'output.pptx')
     if not os.path.exists(file_path):
         return jsonify({'error': 'File not found or expired'}), 404
+    # Conditional responses let clients revalidate (304) or resume (206) instead of re-downloading
     return send_file(file_path, as_attachment=True,
                      download_name='generated_presentation.pptx',
-                     mimetype='application/vnd.openxmlformats-officedocument.presentationml.presentation')
+                     mimetype='application/vnd.openxmlformats-officedocument.presentationml.presentation',
+                     conditional=True, etag=True,
+                     last_modified=os.path.getmtime(file_path),
+                     max_age=DOWNLOAD_MAX_AGE)
+
+@lru_cache(maxsize=1)
+def _models_json():
+    """Serialize the provider/model catalogue once; the lists are static per process"""
+    models = {
+        'gemini': {
+            'models': [
+                'gemini-2.5-pro',
+                'gemini-1.5-pro',
+                'gemini-1.5-flash',
+                'gemini-1.0-pro',
+                'gemini-1.5'
+            ],
+            'default': 'gemini-2.5-pro'
+        },
+        'openai': {
+            'models': _get_provider_class('OpenAIProvider').get_available_models(),
+            'default': 'gpt-4o-mini'
+        },
+        'aipipe': {
+            'models': [
+                'openai/gpt-4o-mini',
+                'openai/gpt-4o',
+                'anthropic/claude-3-5-sonnet',
+                'google/gemini-2.0-flash-exp',
+                'meta-llama/llama-3.1-70b-instruct'
+            ],
+            'default': 'openai/gpt-4o-mini'
+        }
+    }
+    return app.json.dumps(models).encode('utf-8')
 
 @app.route('/api/models')
 def get_available_models():
     """Get available AI models for each provider"""
     try:
-        models = {
-            'gemini': {
-                'models': [
-                    'gemini-2.5-pro',
-                    'gemini-1.5-pro',
-                    'gemini-1.5-flash',
-                    'gemini-1.0-pro',
-                    'gemini-1.5'
-                ],
-                'default': 'gemini-2.5-pro'
-            },
-            'openai': {
-                'models': OpenAIProvider.get_available_models(),
-                'default': 'gpt-4o-mini'
-            },
-            'aipipe': {
-                'models': [
-                    'openai/gpt-4o-mini',
-                    'openai/gpt-4o',
-                    'anthropic/claude-3-5-sonnet',
-                    'google/gemini-2.0-flash-exp',
-                    'meta-llama/llama-3.1-70b-instruct'
-                ],
-                'default': 'openai/gpt-4o-mini'
-            }
-        }
-        return jsonify(models)
+        return Response(_models_json(), mimetype='application/json')
     except Exception as e:
         logger.error(f"Error getting models: {str(e)}")
         return jsonify({'error': 'Failed to get available models'}), 500
@@ -414,7 +852,10 @@ def serve_pdf(session_id):
     pdf_path = os.path.join(session_dir, 'output.pdf')
     if not os.path.exists(pdf_path):
         return 'PDF not found', 404
-    return send_from_directory(session_dir, 'output.pdf', mimetype='application/pdf')
+    return send_from_directory(session_dir, 'output.pdf', mimetype='application/pdf',
+                               conditional=True, etag=True,
+                               last_modified=os.path.getmtime(pdf_path),
+                               max_age=DOWNLOAD_MAX_AGE)
 
 if __name__ == '__main__':
     # Run the app locally
@@ -23,9 +23,15 @@ def main():
     if '--debug' in sys.argv or '-d' in sys.argv:
         app.run(debug=True, host='0.0.0.0', port=5000)
     elif '--prod' in sys.argv or '-p' in sys.argv:
-        # Production mode with gunicorn would be better
-        print("For production, use: gunicorn -w 4 -b 0.0.0.0:5000 app:app")
-        app.run(debug=False, host='0.0.0.0', port=5000)
+        # Production mode: replace this process with gunicorn running gevent workers
+        workers = str(os.cpu_count() or 2)
+        os.environ['PPTGEN_GEVENT'] = '1'
+        try:
+            os.execvp("gunicorn", ["gunicorn", "-k", "gevent", "-w", workers,
+                                   "-b", "0.0.0.0:5000", "--timeout", "120", "app:app"])
+        except OSError as e:
+            print(f"Could not start gunicorn ({e}), falling back to the Flask server")
+            app.run(debug=False, host='0.0.0.0', port=5000)
     else:
         # Default development mode
         app.run(debug=True, host='0.0.0.0', port=5000)
@@ -1,9 +1,272 @@
 import logging
+from functools import lru_cache
 from typing import Dict, List, Any, Tuple, Optional
 import re
 
 logger = logging.getLogger(__name__)
 
+# Compiled once at import; these run for every content item of every slide
+_NUMBERED_RE = re.compile(r'^(\d+[.\)]\s|[a-z][.\)]\s)', re.IGNORECASE)
+# Either a real "N." / "N)" prefix (group 1) or the loose run of digits, dots,
+# dashes, parens and spaces that gets stripped before renumbering
+_NUMBER_PREFIX_RE = re.compile(r'(\d+[.\)])|[0-9.\-) ]*')
+_STRIP_NUM_RE = re.compile(r'^\d+[.\)]\s*')
+
+def _truncate(text: str, limit: int) -> str:
+    """Cut text to limit characters with a trailing ellipsis; short text is returned as-is"""
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit - 3]}..."
+
+def _split_num_prefix(item: str) -> Tuple[bool, str]:
+    """
+    Split an item into (has_number_prefix, text without loose numbering)
+    
+    One regex pass replaces a prefix match followed by lstrip('0123456789.-) ').
+    """
+    m = _NUMBER_PREFIX_RE.match(item)
+    if m.group(1):
+        return True, item
+    return False, item[m.end():]
+
+def _to_numbered(content_items: List[str], suggested_lines: int) -> List[str]:
+    """Ensure numbered format, keeping items that already carry a number"""
+    numbered_items = []
+    for i, item in enumerate(content_items[:suggested_lines]):
+        had_number, rest = _split_num_prefix(item)
+        numbered_items.append(item if had_number else f"{i+1}. {rest}")
+    return numbered_items
+
+def _to_bulleted(content_items: List[str], suggested_lines: int) -> List[str]:
+    """Remove any numbering"""
+    strip_number = _STRIP_NUM_RE.sub
+    return [strip_number('', item) for item in content_items[:suggested_lines]]
+
+def _to_paragraph(content_items: List[str], suggested_lines: int) -> List[str]:
+    """Combine into a paragraph if there are multiple items"""
+    if len(content_items) <= 1:
+        return content_items
+    return [' '.join(content_items[:2])]
+
+# Content reshaping per placeholder text_format; other formats are left as-is
+_FMT_HANDLERS = {
+    'numbered_list': _to_numbered,
+    'bullet_list': _to_bulleted,
+    'paragraph': _to_paragraph,
+}
+
+@lru_cache(maxsize=1024)
+def _numbered_content(content_items: Tuple[str, ...]) -> bool:
+    """Memoized numbered-list check; takes a tuple so it can be cached"""
+    match = _NUMBERED_RE.match
+    numbered_count = sum(1 for item in content_items if match(item))
+    return numbered_count >= len(content_items) / 2
+
+def _materialize_soa(template_info: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Column view of the template slides' scoring fields, cached on template_info
+    
+    The analyzer produces one dict per slide; scoring only needs a handful of
+    fields, so they are copied once into parallel tuples under '_soa' and
+    reused by every mapping pass over the same template.
+    
+    Args:
+        template_info: Template analysis results
+        
+    Returns:
+        Dict of equal-length tuples keyed by field name, plus 'count'
+    """
+    existing_slides = template_info.get('existing_slides', [])
+    soa = template_info.get('_soa')
+    if soa is not None and soa['slides'] is existing_slides and soa['count'] == len(existing_slides):
+        return soa
+    
+    suggested_lines = []
+    for template_slide in existing_slides:
+        placeholder = _categorize_placeholders(template_slide)['content']
+        suggested_lines.append(placeholder.get('suggested_lines', 5) if placeholder else None)
+    
+    soa = {
+        'slides': existing_slides,
+        'count': len(existing_slides),
+        'type': tuple(t.get('suggested_content_type') for t in existing_slides),
+        'has_title': tuple(bool(t.get('has_title')) for t in existing_slides),
+        'has_subtitle': tuple(bool(t.get('has_subtitle')) for t in existing_slides),
+        'has_content': tuple(bool(t.get('has_content')) for t in existing_slides),
+        'format': tuple(t.get('content_format') for t in existing_slides),
+        'suggested_lines': tuple(suggested_lines),
+    }
+    template_info['_soa'] = soa
+    return soa
+
+def _score_matrix(rows: List[Tuple[str, bool, int, bool]], columns: List[int],
+                  tpl: Dict[str, list]) -> List[List[int]]:
+    """
+    Score every content slide against every candidate template slide
+    
+    Each score is a weighted sum of boolean rule terms. Terms that depend only
+    on the template slide are computed once per column, so the inner loop only
+    adds the content-dependent part.
+    
+    Args:
+        rows: (slide_type, has_subtitle, content_count, has_numbered) per content slide
+        columns: Template slide indices that are still available
+        tpl: Column store from _materialize_soa
+        
+    Returns:
+        len(rows) x len(columns) score matrix
+    """
+    tpl_type = tpl['type']
+    tpl_has_title = tpl['has_title']
+    tpl_has_subtitle = tpl['has_subtitle']
+    tpl_has_content = tpl['has_content']
+    tpl_format = tpl['format']
+    tpl_lines = tpl['suggested_lines']
+    late_start = tpl['count'] - 3
+    
+    # Column-only terms: (title-slide score, other-slide base score)
+    title_base = []
+    body_base = []
+    for idx in columns:
+        title_cap = 5 * tpl_has_title[idx]
+        title_base.append(
+            100 * (idx == 0)                            # first slide is the natural title slide
+            + 20 * (0 < idx < 3)                        # early slides are a weaker fallback
+            + 50 * (tpl_type[idx] == 'title')
+            + 30 * (tpl_has_title[idx] and tpl_has_subtitle[idx])
+            + title_cap
+        )
+        body_base.append(title_cap - 50 * (idx == 0))   # keep slide 0 for the title
+    
+    scores = []
+    for slide_type, has_subtitle, content_count, has_numbered in rows:
+        is_title = slide_type == 'title'
+        is_conclusion = slide_type == 'conclusion'
+        row = []
+        for col, idx in enumerate(columns):
+            has_sub = tpl_has_subtitle[idx]
+            score = (
+                5 * (has_subtitle and has_sub)
+                + 3 * (not has_subtitle and not has_sub)
+                + 10 * (is_conclusion and idx >= late_start)
+            )
+            if is_title:
+                row.append(score + title_base[col])
+                continue
+            
+            score += body_base[col] + 20 * (tpl_type[idx] == slide_type)
+            if tpl_has_content[idx]:
+                content_format = tpl_format[idx]
+                suggested_lines = tpl_lines[idx]
+                fits_capacity = suggested_lines is not None and abs(suggested_lines - content_count) <= 2
+                has_room = suggested_lines is not None and suggested_lines >= content_count
+                score += (
+                    8 * (content_format == 'numbered_list' and has_numbered)
+                    + 6 * (content_format == 'bullet_list' and content_count > 0)
+                    + 4 * (content_format == 'paragraph' and content_count <= 2)
+                    + 5 * fits_capacity
+                    + 3 * (has_room and not fits_capacity)
+                )
+            row.append(score)
+        scores.append(row)
+    
+    return scores
+
+def _solve_assignment(scores: List[List[int]]) -> Dict[int, int]:
+    """
+    Pick a one-to-one row -> column assignment with the highest total score
+    
+    Hungarian method with potentials, O(n^2 * m). Rows beyond the number of
+    columns (or vice versa) are left unassigned.
+    
+    Args:
+        scores: Rectangular score matrix, rows are content slides, columns template slides
+        
+    Returns:
+        Dict mapping row index to column index
+    """
+    n = len(scores)
+    m = len(scores[0]) if n else 0
+    if n == 0 or m == 0:
+        return {}
+    if n > m:
+        transposed = _solve_assignment([list(col) for col in zip(*scores)])
+        return {row: col for col, row in transposed.items()}
+    
+    inf = float('inf')
+    u = [0] * (n + 1)
+    v = [0] * (m + 1)
+    owner = [0] * (m + 1)  # owner[j] = 1-based row assigned to column j
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        owner[0] = i
+        j0 = 0
+        minv = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = owner[j0]
+            row = scores[i0 - 1]
+            delta = inf
+            j1 = 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    cur = -row[j - 1] - u[i0] - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[owner[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if owner[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            owner[j0] = owner[j1]
+            j0 = j1
+    
+    return {owner[j] - 1: j - 1 for j in range(1, m + 1) if owner[j]}
+
+def _categorize_placeholders(template_slide: Dict[str, Any]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Find the first title, subtitle and content/body placeholder of a template slide
+    
+    The result is memoized on the slide dict as '_cats', so mapping and
+    refinement share a single pass over the placeholders.
+    
+    Args:
+        template_slide: Template slide info from the analyzer
+        
+    Returns:
+        Dict with 'title', 'subtitle' and 'content' keys (None when absent)
+    """
+    cats = template_slide.get('_cats')
+    if cats is not None:
+        return cats
+    
+    cats = {'title': None, 'subtitle': None, 'content': None}
+    for placeholder in template_slide.get('placeholders', ()):
+        ph_type = str(placeholder.get('type', '')).upper()
+        if 'SUBTITLE' in ph_type:
+            if cats['subtitle'] is None:
+                cats['subtitle'] = placeholder
+        elif 'TITLE' in ph_type:
+            if cats['title'] is None:
+                cats['title'] = placeholder
+        elif 'CONTENT' in ph_type or 'BODY' in ph_type:
+            if cats['content'] is None:
+                cats['content'] = placeholder
+    
+    template_slide['_cats'] = cats
+    return cats
+
 class ContentMapper:
     """Maps AI-generated content to best-matching template slides"""
     
@@ -30,36 +293,38 @@ class ContentMapper:
         
         # Create mapping between content and template slides
         mapping = []
-        used_indices = set()
+        free_indices = list(range(len(existing_slides)))
         
         # SPECIAL CASE: Always try to use slide 0 for the title slide if we have one
-        title_slides = [s for s in ai_content if s.get('slide_type') == 'title']
-        if title_slides and len(existing_slides) > 0:
+        title_idx = next((i for i, s in enumerate(ai_content) if s.get('slide_type') == 'title'), None)
+        if title_idx is not None and len(existing_slides) > 0:
             # Force first slide to be used for title
             mapping.append({
-                'content': title_slides[0],
+                'content': ai_content[title_idx],
                 'template_slide_index': 0,
                 'template_slide': existing_slides[0]
             })
-            used_indices.add(0)
-            # Remove the title slide from further processing
-            ai_content = [s for s in ai_content if s != title_slides[0]]
+            del free_indices[0]
+            # Remove the title slide from further processing (by position, not dict equality)
+            ai_content = ai_content[:title_idx] + ai_content[title_idx + 1:]
         
-        # Map remaining slides
-        for content_slide in ai_content:
-            best_match = self._find_best_template_match(
-                content_slide, 
-                existing_slides, 
-                used_indices
-            )
-            
-            if best_match is not None:
-                mapping.append({
-                    'content': content_slide,
-                    'template_slide_index': best_match,
-                    'template_slide': existing_slides[best_match]
-                })
-                used_indices.add(best_match)
+        # Map remaining slides with one global assignment rather than greedy first-best picks
+        tpl = _materialize_soa(template_info)
+        rows = [self._content_features(content_slide) for content_slide in ai_content]
+        scores = _score_matrix(rows, free_indices, tpl)
+        assignment = _solve_assignment(scores)
+        
+        for row, content_slide in enumerate(ai_content):
+            col = assignment.get(row)
+            # Negative scores were never accepted by the greedy matcher either
+            if col is None or scores[row][col] < 0:
+                continue
+            best_match = free_indices[col]
+            mapping.append({
+                'content': content_slide,
+                'template_slide_index': best_match,
+                'template_slide': existing_slides[best_match]
+            })
         
         # Prepare final content with template constraints
         final_content = []
@@ -75,140 +340,48 @@ class ContentMapper:
         
         return final_content, selected_indices
     
-    def _find_best_template_match(self, content_slide: Dict[str, Any], 
-                                 template_slides: List[Dict[str, Any]], 
-                                 used_indices: set) -> Optional[int]:
-        """Find the best template slide for given content"""
-        
-        slide_type = content_slide.get('slide_type', 'content')
-        has_subtitle = bool(content_slide.get('subtitle'))
+    def _content_features(self, content_slide: Dict[str, Any]) -> Tuple[str, bool, int, bool]:
+        """Extract (slide_type, has_subtitle, content_count, has_numbered) from a content slide"""
         content_items = content_slide.get('content', [])
-        content_count = len(content_items) if content_items else 0
-        
-        best_score = -1
-        best_index = None
-        
-        for idx, template_slide in enumerate(template_slides):
-            if idx in used_indices:
-                continue
-            
-            score = 0
-            
-            # CRITICAL: For title slides, strongly prefer the first slide (index 0)
-            if slide_type == 'title':
-                if idx == 0:
-                    score += 100  # Heavily weight the first slide for title
-                elif idx < 3:
-                    score += 20  # Still consider early slides but much lower
-                    
-                # Also check if it's marked as a title slide
-                if template_slide.get('suggested_content_type') == 'title':
-                    score += 50
-                    
-                # Title slides should have title and subtitle placeholders
-                if template_slide.get('has_title') and template_slide.get('has_subtitle'):
-                    score += 30
-            else:
-                # For non-title slides, match slide type
-                if template_slide.get('suggested_content_type') == slide_type:
-                    score += 20
-                
-                # Avoid using the first slide for non-title content
-                if idx == 0:
-                    score -= 50
-            
-            # Match title capability
-            if template_slide.get('has_title'):
-                score += 5
-            
-            # Match subtitle capability
-            if has_subtitle and template_slide.get('has_subtitle'):
-                score += 5
-            elif not has_subtitle and not template_slide.get('has_subtitle'):
-                score += 3
-            
-            # Match content capability for content slides
-            if slide_type != 'title' and template_slide.get('has_content'):
-                # Check if content format matches
-                content_format = template_slide.get('content_format')
-                
-                if content_format == 'numbered_list' and self._has_numbered_content(content_items):
-                    score += 8
-                elif content_format == 'bullet_list' and content_count > 0:
-                    score += 6
-                elif content_format == 'paragraph' and content_count <= 2:
-                    score += 4
-                
-                # Check content capacity
-                content_placeholders = [p for p in template_slide.get('placeholders', []) 
-                                       if 'CONTENT' in p.get('type', '') or 'BODY' in p.get('type', '')]
-                
-                if content_placeholders:
-                    placeholder = content_placeholders[0]
-                    suggested_lines = placeholder.get('suggested_lines', 5)
-                    
-                    if abs(suggested_lines - content_count) <= 2:
-                        score += 5
-                    elif suggested_lines >= content_count:
-                        score += 3
-            
-            # Prefer later slides for conclusion
-            if slide_type == 'conclusion' and idx >= len(template_slides) - 3:
-                score += 10
-            
-            if score > best_score:
-                best_score = score
-                best_index = idx
-        
-        return best_index
+        return (
+            content_slide.get('slide_type', 'content'),
+            bool(content_slide.get('subtitle')),
+            len(content_items) if content_items else 0,
+            self._has_numbered_content(content_items),
+        )
     
     def _has_numbered_content(self, content_items: List[str]) -> bool:
         """Check if content has numbered list pattern"""
         if not content_items:
             return False
         
-        numbered_pattern = re.compile(r'^(\d+[\.\)]\s|[a-z][\.\)]\s)', re.IGNORECASE)
-        numbered_count = sum(1 for item in content_items if numbered_pattern.match(str(item)))
-        
-        return numbered_count >= len(content_items) / 2
+        return _numbered_content(tuple(map(str, content_items)))
     
     def _adjust_content_for_template(self, content: Dict[str, Any], 
                                     template_slide: Dict[str, Any]) -> Dict[str, Any]:
         """Adjust content to fit template slide constraints"""
         
         adjusted = content.copy()
+        cats = _categorize_placeholders(template_slide)
         
         # Adjust title length
         if template_slide.get('has_title'):
-            title_placeholder = next(
-                (p for p in template_slide.get('placeholders', []) if 'TITLE' in p.get('type', '')),
-                None
-            )
+            title_placeholder = cats['title']
             if title_placeholder:
-                max_chars = title_placeholder.get('max_chars_per_line', 60)
-                if adjusted.get('title') and len(adjusted['title']) > max_chars:
-                    adjusted['title'] = adjusted['title'][:max_chars-3] + '...'
+                if adjusted.get('title'):
+                    adjusted['title'] = _truncate(adjusted['title'], title_placeholder.get('max_chars_per_line', 60))
         
         # Adjust subtitle
         if not template_slide.get('has_subtitle'):
             adjusted['subtitle'] = None
         elif template_slide.get('has_subtitle') and adjusted.get('subtitle'):
-            subtitle_placeholder = next(
-                (p for p in template_slide.get('placeholders', []) if 'SUBTITLE' in p.get('type', '')),
-                None
-            )
+            subtitle_placeholder = cats['subtitle']
             if subtitle_placeholder:
-                max_chars = subtitle_placeholder.get('max_chars_per_line', 100)
-                if len(adjusted['subtitle']) > max_chars:
-                    adjusted['subtitle'] = adjusted['subtitle'][:max_chars-3] + '...'
+                adjusted['subtitle'] = _truncate(adjusted['subtitle'], subtitle_placeholder.get('max_chars_per_line', 100))
         
         # Adjust content format and length
         if template_slide.get('has_content') and adjusted.get('content'):
-            content_placeholder = next(
-                (p for p in template_slide.get('placeholders', []) 
-                 if 'CONTENT' in p.get('type', '') or 'BODY' in p.get('type', '')),
-                None
-            )
+            content_placeholder = cats['content']
             
             if content_placeholder:
                 suggested_lines = content_placeholder.get('suggested_lines', 5)
@@ -218,27 +391,14 @@ class ContentMapper:
                 # Adjust content format
                 content_items = adjusted['content']
                 
-                if text_format == 'numbered_list':
-                    # Ensure numbered format
-                    adjusted['content'] = [
-                        f"{i+1}. {item.lstrip('0123456789.-) ')}" 
-                        if not re.match(r'^\d+[\.\)]', item) else item
-                        for i, item in enumerate(content_items[:suggested_lines])
-                    ]
-                elif text_format == 'bullet_list':
-                    # Remove any numbering
-                    adjusted['content'] = [
-                        re.sub(r'^\d+[\.\)]\s*', '', item)
-                        for item in content_items[:suggested_lines]
-                    ]
-                elif text_format == 'paragraph':
-                    # Combine into paragraph if multiple items
-                    if len(content_items) > 1:
-                        adjusted['content'] = [' '.join(content_items[:2])]
+                handler = _FMT_HANDLERS.get(text_format)
+                if handler is not None:
+                    adjusted['content'] = handler(content_items, suggested_lines)
                 
                 # Trim to character limits
+                cut = max_chars_per_line - 3
                 adjusted['content'] = [
-                    item[:max_chars_per_line-3] + '...' if len(item) > max_chars_per_line else item
+                    item if len(item) <= max_chars_per_line else f"{item[:cut]}..."
                     for item in adjusted['content']
                 ]
         
@@ -260,40 +420,42 @@ class ContentMapper:
         Returns:
             Refinement instructions for AI
         """
-        refinements = []
+        existing_slides = template_info['existing_slides']
+        refinements = [None] * len(mapped_content)
         
-        for content in mapped_content:
+        for k, content in enumerate(mapped_content):
             slide_idx = content.get('_template_slide_index')
-            template_slide = template_info['existing_slides'][slide_idx]
+            template_slide = existing_slides[slide_idx]
+            
+            # Add specific constraints
+            cats = _categorize_placeholders(template_slide)
+            constraints = {}
+            
+            placeholder = cats['title']
+            if placeholder:
+                constraints['title'] = {
+                    'max_chars': placeholder.get('max_chars_per_line', 60),
+                    'current_length': len(content.get('title') or '')
+                }
+            placeholder = cats['subtitle']
+            if placeholder:
+                constraints['subtitle'] = {
+                    'max_chars': placeholder.get('max_chars_per_line', 100),
+                    'required': template_slide.get('has_subtitle', False)
+                }
+            placeholder = cats['content']
+            if placeholder:
+                constraints['content'] = {
+                    'format': placeholder.get('text_format', 'bullet_list'),
+                    'max_lines': placeholder.get('suggested_lines', 5),
+                    'max_chars_per_line': placeholder.get('max_chars_per_line', 80),
+                    'current_items': len(content.get('content') or [])
+                }
             
-            refinement = {
+            refinements[k] = {
                 'original_content': content,
                 'slide_number': slide_idx + 1,
-                'constraints': {}
+                'constraints': constraints
             }
-            
-            # Add specific constraints
-            for placeholder in template_slide.get('placeholders', []):
-                ph_type = placeholder.get('type', '')
-                
-                if 'TITLE' in ph_type:
-                    refinement['constraints']['title'] = {
-                        'max_chars': placeholder.get('max_chars_per_line', 60),
-                        'current_length': len(content.get('title', ''))
-                    }
-                elif 'SUBTITLE' in ph_type:
-                    refinement['constraints']['subtitle'] = {
-                        'max_chars': placeholder.get('max_chars_per_line', 100),
-                        'required': template_slide.get('has_subtitle', False)
-                    }
-                elif 'CONTENT' in ph_type or 'BODY' in ph_type:
-                    refinement['constraints']['content'] = {
-                        'format': placeholder.get('text_format', 'bullet_list'),
-                        'max_lines': placeholder.get('suggested_lines', 5),
-                        'max_chars_per_line': placeholder.get('max_chars_per_line', 80),
-                        'current_items': len(content.get('content', []))
-                    }
-            
-            refinements.append(refinement)
         
         return refinements
@@ -2,9 +2,13 @@
 Helpers to detect content formats and placeholder capacities
 """
 import re
-from typing import List, Dict, Any
+from functools import lru_cache
+from typing import List, Dict, Any, Tuple
 
 BULLET_PREFIXES = ("• ", "- ", "* ", "•", "-")
+_NUMBERED_FMT_RE = re.compile(r"^\d+[.)]\s")
+# Any of the placeholder separator markers, matched in one scan
+_SEP_RE = re.compile(r"\[NEXT_PLACEHOLDER\]|\[PLACEHOLDER\]|\[TEXT_AREA\]|---|###", re.IGNORECASE)
 
 
 def detect_content_format(items: List[str]) -> str:
@@ -14,18 +18,32 @@ def detect_content_format(items: List[str]) -> str:
     """
     if not items:
         return 'bullet_list'
+    return _detect_content_format(tuple(map(str, items)))
 
-    # Normalize
-    norm = [str(x).strip() for x in items if str(x).strip()]
-    if not norm:
-        return 'bullet_list'
-
-    # Check separators are not considered
-    norm_wo_markers = [x for x in norm if not _is_separator(x)]
 
-    numbered_re = re.compile(r"^\d+[\.|\)]\s")
-    numbered = sum(1 for x in norm_wo_markers if numbered_re.match(x))
-    bullets = sum(1 for x in norm_wo_markers if x.startswith(BULLET_PREFIXES))
+@lru_cache(maxsize=1024)
+def _detect_content_format(items: Tuple[str, ...]) -> str:
+    # Normalize in one pass; separators are not considered
+    norm_wo_markers = []
+    numbered = bullets = 0
+    is_numbered = _NUMBERED_FMT_RE.match
+    bullet_prefixes = BULLET_PREFIXES
+    has_items = False
+    for x in items:
+        x = x.strip()
+        if not x:
+            continue
+        has_items = True
+        if _is_separator(x):
+            continue
+        norm_wo_markers.append(x)
+        if is_numbered(x):
+            numbered += 1
+        elif x.startswith(bullet_prefixes):
+            bullets += 1
+
+    if not has_items:
+        return 'bullet_list'
 
     # Paragraph detection: if only one long item
     if len(norm_wo_markers) == 1 and len(norm_wo_markers[0]) > 140:
@@ -48,8 +66,8 @@ def has_separators(items: List[str]) -> bool:
 
 
 def _is_separator(text: str) -> bool:
-    t = str(text).upper()
-    return any(sep in t for sep in ["[NEXT_PLACEHOLDER]", "[PLACEHOLDER]", "[TEXT_AREA]", "---", "###"]) or t == "|" or t == "||"
+    t = str(text)
+    return _SEP_RE.search(t) is not None or t.strip() in ("|", "||")
 
 
 def count_groups_by_separators(items: List[str]) -> int:
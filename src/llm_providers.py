@@ -1,41 +1,582 @@
+import asyncio
+import atexit
+import hashlib
 import json
 import logging
-from typing import List, Dict, Any
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import weakref
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional
 import google.generativeai as genai
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+try:
+    from .content_mapper import ContentMapper
+except ImportError:
+    from content_mapper import ContentMapper
 try:
     import openai
+    import httpx  # installed with openai, used for its connection pool
 except ImportError:
     openai = None
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    from google.api_core import exceptions as google_exceptions
+except ImportError:
+    google_exceptions = None
+try:
+    from google.generativeai import client as genai_client
+except ImportError:
+    genai_client = None
+try:
+    from google import genai as genai_sdk  # google-genai client, used for the Batch API
+except ImportError:
+    genai_sdk = None
 
 logger = logging.getLogger(__name__)
 
-class BaseLLMProvider:
-    """Base class for LLM providers"""
+# First markdown code fence (optionally tagged json) in a model response
+_FENCE_RE = re.compile(r'```(?:json)?(.*?)```', re.DOTALL)
+# Trailing comma before a closing bracket/brace (one pass for both), and the outermost [...] span
+_TRAILING_COMMA = re.compile(r',(\s*[}\]])')
+_JSON_ARR = re.compile(r'\[.*\]', re.DOTALL)
+# Tokens that matter when bracket-matching JSON: escape pairs, quotes, square brackets
+_ARRAY_TOKEN_RE = re.compile(r'\\.|["\[\]]', re.DOTALL)
+
+def _extract_json_array(text: str) -> Optional[str]:
+    """Return the first balanced [...] span in text, ignoring brackets inside strings"""
+    start = text.find('[')
+    if start == -1:
+        return None
+    depth = 0
+    in_str = False
+    for m in _ARRAY_TOKEN_RE.finditer(text, start):
+        tok = m.group()
+        if tok == '"':
+            in_str = not in_str
+        elif in_str or len(tok) == 2:
+            continue
+        elif tok == '[':
+            depth += 1
+        else:
+            depth -= 1
+            if not depth:
+                return text[start:m.end()]
+    return None
+
+# Whitespace after sentence-ending punctuation; "3.5%" and a leading "..." are not boundaries
+_SENT_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+def _sentence_chunks(text: str, size: int = 3, limit: int = 30) -> List[str]:
+    """Split text into chunks of `size` sentences sliced from the original text;
+    only the first `limit` sentences are kept"""
+    chunks, start, count = [], 0, 0
+    for boundary in _SENT_BOUNDARY.finditer(text):
+        count += 1
+        if count % size == 0:
+            chunks.append(text[start:boundary.start()].strip())
+            start = boundary.end()
+            if count >= limit:
+                return chunks
+    if text[start:].strip():
+        chunks.append(text[start:].strip())
+    return chunks or [text.strip()]
+
+# Placeholder names that are static list markers (numbers, numerals, bullets), not content
+_MARKER = re.compile(r'\d+|[ivxlc]+|[a-zA-Z]\.|•|\-|\–')
+
+# orjson's decode errors subclass json.JSONDecodeError, so callers can keep catching that
+_loads = orjson.loads if orjson is not None else json.loads
+
+def _validate_in_place(slide_data: List[Any], validate) -> List[Dict[str, Any]]:
+    """Swap each decoded slide for its validated copy, freeing raw slides as it goes"""
+    for i, slide in enumerate(slide_data):
+        slide_data[i] = validate(slide)
+    return slide_data
+
+def _dumps(obj) -> bytes:
+    """Serialize a request body to UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode('utf-8')
+
+def _iter_json_objects(chunks):
+    """
+    Yield each top-level object of a streamed JSON array as soon as it closes
     
-    def __init__(self, api_key: str, model_name: str = None):
-        self.api_key = api_key
-        self.model_name = model_name
+    Text before the opening '[' (prose, a code fence) is skipped; strings are
+    tracked so brackets inside them don't affect nesting.
+    """
+    depth = 0  # 1 inside the array, 2+ inside an element
+    in_str = escaped = False
+    buf = []
+    for chunk in chunks:
+        for ch in chunk:
+            if in_str:
+                buf.append(ch)
+                if escaped:
+                    escaped = False
+                elif ch == '\\':
+                    escaped = True
+                elif ch == '"':
+                    in_str = False
+            elif depth == 0:
+                if ch == '[':
+                    depth = 1
+            elif ch in '{[':
+                depth += 1
+                buf.append(ch)
+            elif ch in '}]':
+                if depth == 1:
+                    return
+                depth -= 1
+                buf.append(ch)
+                if depth == 1:
+                    yield ''.join(buf)
+                    buf = []
+            elif depth > 1:
+                buf.append(ch)
+                if ch == '"':
+                    in_str = True
+
+# Opt-in cache of raw LLM responses (the only LLM cache layer), LLM_CACHE_MODE:
+#   off        - no caching
+#   exact      - reuse responses for an identical (model, prompt)
+#   generative - also reuse a response when the prompt skeleton matches and the
+#                source text is a near-duplicate (word-shingle Jaccard similarity)
+# The older PPTGEN_SEMANTIC_CACHE=1 switch still selects generative mode.
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "generative" if os.getenv("PPTGEN_SEMANTIC_CACHE") == "1" else "off").lower()
+# Responses sampled above this temperature are neither stored nor reused, since a hit
+# would pin one random sample; raise it (e.g. to 0.3) to cache the providers' default calls
+LLM_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", 0.0))
+LLM_RESPONSE_CACHE_DIR = os.path.join(tempfile.gettempdir(), "pptcache-responses")
+LLM_RESPONSE_CACHE_TTL = 86400  # seconds
+# Expired files, then the oldest ones beyond the size cap, are deleted on write, at most
+# once per LLM_CACHE_PRUNE_INTERVAL per process
+LLM_RESPONSE_CACHE_MAX_BYTES = int(os.getenv("LLM_RESPONSE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+LLM_CACHE_PRUNE_INTERVAL = 300  # seconds
+_last_cache_prune = 0.0
+_cache_prune_lock = threading.Lock()
+LLM_CACHE_SIMILARITY = float(os.getenv("LLM_CACHE_SIMILARITY", 0.9))
+LLM_CACHE_BUCKET_SIZE = 32  # near-duplicate entries kept per prompt skeleton
+# In-process LRU in front of the file cache (exact matches only)
+LLM_MEMORY_CACHE_SIZE = 128
+_memory_cache = OrderedDict()  # cache key -> (stored_at, response_text)
+_memory_cache_lock = threading.Lock()
+
+def prune_response_cache(now: float = None) -> None:
+    """Delete expired files from LLM_RESPONSE_CACHE_DIR, then the oldest until it fits the size cap"""
+    now = now or time.time()
+    live = []
+    try:
+        entries = os.scandir(LLM_RESPONSE_CACHE_DIR)
+    except OSError:
+        return
+    with entries:
+        for entry in entries:
+            try:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                st = entry.stat(follow_symlinks=False)
+                if now - st.st_mtime > LLM_RESPONSE_CACHE_TTL:
+                    os.remove(entry.path)
+                else:
+                    live.append((st.st_mtime, st.st_size, entry.path))
+            except OSError:
+                continue
     
-    def parse_text_to_slides(self, text_content: str, guidance: str = "", template_structure: Dict[str, Any] = None, num_slides: int = None) -> List[Dict[str, Any]]:
-        """Parse input text into structured slide content, enforcing text length and slide count"""
-        # Enforce text character limit (same as app.py)
-        MAX_TEXT_CHARS = 60000
-        if text_content and len(text_content) > MAX_TEXT_CHARS:
-            text_content = text_content[:MAX_TEXT_CHARS]
-        # Build prompt with slide count if provided
-        prompt = self._build_prompt(text_content, guidance, template_structure, num_slides=num_slides)
-        # Actual LLM call is implemented in subclasses
-        raise NotImplementedError("Subclasses must implement parse_text_to_slides")
+    total = sum(size for _, size, _ in live)
+    if total <= LLM_RESPONSE_CACHE_MAX_BYTES:
+        return
+    live.sort()
+    for _, size, path in live:
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        if total <= LLM_RESPONSE_CACHE_MAX_BYTES:
+            break
+
+def _maybe_prune_response_cache() -> None:
+    global _last_cache_prune
+    now = time.time()
+    with _cache_prune_lock:
+        if now - _last_cache_prune < LLM_CACHE_PRUNE_INTERVAL:
+            return
+        _last_cache_prune = now
+    prune_response_cache(now)
+
+def _text_shingles(text: str) -> set:
+    """Hashed 3-word shingles of text, whitespace-insensitive (case is kept: it shows in the slides)"""
+    words = text.split()
+    if len(words) < 3:
+        return {zlib.crc32(' '.join(words).encode('utf-8'))}
+    return {zlib.crc32(' '.join(words[i:i + 3]).encode('utf-8')) for i in range(len(words) - 2)}
+
+# Upper bound on concurrent async Gemini requests per event loop (keeps fan-out under QPM limits)
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", 4))
+_async_semaphores = weakref.WeakKeyDictionary()  # event loop -> asyncio.Semaphore
+
+# Same for async OpenAI requests; the SDK itself retries 429/5xx/connection errors with backoff
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", 10))
+OPENAI_MAX_RETRIES = 3
+_openai_semaphores = weakref.WeakKeyDictionary()  # event loop -> asyncio.Semaphore
+
+def _get_async_semaphore(registry=_async_semaphores, limit: int = GEMINI_MAX_CONCURRENCY) -> asyncio.Semaphore:
+    """Semaphore for the running event loop, created on first use"""
+    loop = asyncio.get_running_loop()
+    semaphore = registry.get(loop)
+    if semaphore is None:
+        semaphore = registry[loop] = asyncio.Semaphore(limit)
+    return semaphore
+
+# Output budget for Gemini calls; a slide with six full bullets is ~300 tokens of JSON
+_TOKENS_PER_SLIDE = 400
+_TOKENS_BASE = 512
+_MAX_OUTPUT_TOKENS = 8192
+
+# Structured-output schema for every Gemini slide response (OpenAPI subset)
+_SLIDES_SCHEMA = {
+    'type': 'array',
+    'items': {
+        'type': 'object',
+        'properties': {
+            'slide_type': {'type': 'string', 'enum': ['title', 'content', 'conclusion']},
+            'title': {'type': 'string'},
+            'subtitle': {'type': 'string', 'nullable': True},
+            'content': {'type': 'array', 'items': {'type': 'string'}, 'nullable': True},
+        },
+        'required': ['slide_type', 'title', 'subtitle', 'content'],
+    },
+}
+
+def _max_output_tokens(slide_count: int = None) -> int:
+    return min(_MAX_OUTPUT_TOKENS, _TOKENS_BASE + _TOKENS_PER_SLIDE * (slide_count or 15))
+
+def _generation_config(slide_count: int = None):
+    """Low-temperature, schema-constrained generation config sized to the expected slide count"""
+    kwargs = {
+        'temperature': 0.2,
+        'top_p': 0.9,
+        'max_output_tokens': _max_output_tokens(slide_count),
+    }
+    for extra in ({'response_mime_type': 'application/json', 'response_schema': _SLIDES_SCHEMA},
+                  {'response_mime_type': 'application/json'},
+                  {}):
+        try:
+            return genai.types.GenerationConfig(**kwargs, **extra)
+        except TypeError:
+            # response_schema needs google-generativeai >= 0.6, response_mime_type >= 0.5
+            continue
+
+def _key_id(api_key: str) -> str:
+    """Digest standing in for an API key in cache keys, so caches don't hold the secret"""
+    return hashlib.blake2b(api_key.encode('utf-8'), digest_size=16).hexdigest()
+
+# GenerativeModel objects shared across provider instances, keyed by
+# (key digest, model_name, system_instruction); None marks an unsupported instruction
+MODEL_CACHE_SIZE = 64
+_MODEL_CACHE = OrderedDict()
+_MODEL_CACHE_LOCK = threading.Lock()
+_configured_key_id = None  # digest of the key most recently passed to genai.configure (process-global)
+
+def _configure_locked(api_key: str) -> None:
+    """Point genai's global configuration at api_key; caller holds _MODEL_CACHE_LOCK"""
+    global _configured_key_id
+    key_id = _key_id(api_key)
+    if key_id != _configured_key_id:
+        genai.configure(api_key=api_key)
+        _configured_key_id = key_id
+
+def _shared_model(api_key: str, model_name: str, system_instruction: str = None):
+    """
+    Return the cached GenerativeModel for this key/model
     
-    def _build_prompt(self, text_content: str, guidance: str, template_structure: Dict[str, Any] = None, num_slides: int = None) -> str:
-        """Build the prompt for the LLM - shared across providers"""
-        
-        # If template structure is provided, create a customized prompt
-        if template_structure and 'existing_slides' in template_structure:
-            return self._build_template_aware_prompt(text_content, guidance, template_structure, num_slides)
-        
-        # Otherwise use the standard prompt
-        base_prompt = """
+    A GenerativeModel takes its client from genai's global configuration on first
+    use and keeps it, so a new model gets its sync client bound here, under the
+    lock and right after configuring its own key; otherwise a request on another
+    key could reconfigure genai in between and the cached model would keep that
+    key's credentials.
+    """
+    with _MODEL_CACHE_LOCK:
+        key = (_key_id(api_key), model_name, system_instruction)
+        if key in _MODEL_CACHE:
+            _MODEL_CACHE.move_to_end(key)
+            return _MODEL_CACHE[key]
+        _configure_locked(api_key)
+        if system_instruction is None:
+            model = genai.GenerativeModel(model_name)
+        else:
+            try:
+                model = genai.GenerativeModel(model_name, system_instruction=system_instruction)
+            except TypeError:
+                # google-generativeai releases before 0.5 have no system_instruction
+                model = None
+        if model is not None and genai_client is not None:
+            model._client = genai_client.get_default_generative_client()
+        _MODEL_CACHE[key] = model
+        if len(_MODEL_CACHE) > MODEL_CACHE_SIZE:
+            _MODEL_CACHE.popitem(last=False)
+        return model
+
+def _bind_async_client(model, api_key: str) -> None:
+    """
+    Bind a shared model's async client to its own key before its first async call
+    
+    Done lazily (the grpc.aio client belongs on the running event loop) but under
+    the same lock as _shared_model, for the same reason.
+    """
+    if genai_client is None or getattr(model, '_async_client', True) is not None:
+        return
+    with _MODEL_CACHE_LOCK:
+        if model._async_client is None:
+            _configure_locked(api_key)
+            model._async_client = genai_client.get_default_generative_async_client()
+
+# One synchronous OpenAI client (and keep-alive connection pool) per API key, for the
+# most recently used keys. Async clients are shared the same way but per event loop,
+# since their pools are bound to the loop that opened them.
+OPENAI_CLIENT_CACHE_SIZE = 32
+_OPENAI_CLIENTS = OrderedDict()  # key digest -> openai.OpenAI, least recently used first
+_OPENAI_CLIENTS_LOCK = threading.Lock()
+
+def _shared_openai_client(api_key: str):
+    """Return the cached openai.OpenAI client for this key, creating it on first use"""
+    key_id = _key_id(api_key)
+    with _OPENAI_CLIENTS_LOCK:
+        client = _OPENAI_CLIENTS.get(key_id)
+        if client is not None:
+            _OPENAI_CLIENTS.move_to_end(key_id)
+            return client
+        http_client = httpx.Client(limits=httpx.Limits(max_keepalive_connections=20, max_connections=20,
+                                                       keepalive_expiry=60))
+        client = _OPENAI_CLIENTS[key_id] = openai.OpenAI(api_key=api_key, http_client=http_client)
+        # An evicted client may still be mid-request in another thread, so its pool is
+        # closed when the last provider holding it lets go rather than on eviction
+        weakref.finalize(client, http_client.close)
+        if len(_OPENAI_CLIENTS) > OPENAI_CLIENT_CACHE_SIZE:
+            _OPENAI_CLIENTS.popitem(last=False)
+        return client
+
+_OPENAI_ASYNC_CLIENTS = weakref.WeakKeyDictionary()  # event loop -> OrderedDict of key digest -> AsyncOpenAI
+
+def _shared_async_openai_client(api_key: str):
+    """Return the openai.AsyncOpenAI client for this key on the running event loop"""
+    loop = asyncio.get_running_loop()
+    key_id = _key_id(api_key)
+    with _OPENAI_CLIENTS_LOCK:
+        clients = _OPENAI_ASYNC_CLIENTS.get(loop)
+        if clients is None:
+            clients = _OPENAI_ASYNC_CLIENTS[loop] = OrderedDict()
+        client = clients.get(key_id)
+        if client is not None:
+            clients.move_to_end(key_id)
+            return client
+        client = clients[key_id] = openai.AsyncOpenAI(api_key=api_key, max_retries=OPENAI_MAX_RETRIES)
+        if len(clients) > OPENAI_CLIENT_CACHE_SIZE:
+            clients.popitem(last=False)
+        return client
+
+async def close_async_openai_clients():
+    """Close the running event loop's shared AsyncOpenAI clients (call before the loop ends)"""
+    with _OPENAI_CLIENTS_LOCK:
+        clients = _OPENAI_ASYNC_CLIENTS.pop(asyncio.get_running_loop(), None)
+    for client in (clients or {}).values():
+        try:
+            await client.close()
+        except Exception as e:
+            logger.warning("Could not close async OpenAI client: %s", e)
+
+@atexit.register
+def close_openai_clients():
+    """Close the shared OpenAI clients and their connection pools"""
+    with _OPENAI_CLIENTS_LOCK:
+        for client in _OPENAI_CLIENTS.values():
+            try:
+                client.close()
+            except Exception as e:
+                logger.warning("Could not close OpenAI client: %s", e)
+        _OPENAI_CLIENTS.clear()
+
+# Retry/backoff and client-side rate limiting for live Gemini calls
+GEMINI_MAX_RETRIES = 5
+GEMINI_RETRY_MAX_WAIT = 30  # seconds, cap on one backoff delay
+GEMINI_REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", 60))
+# Rate limits and server-side hiccups that are worth retrying
+_TRANSIENT_ERRORS = (
+    (google_exceptions.ResourceExhausted, google_exceptions.InternalServerError,
+     google_exceptions.ServiceUnavailable, google_exceptions.DeadlineExceeded)
+    if google_exceptions is not None else ()
+)
+
+class _TokenBucket:
+    """Thread-safe token bucket; reserve() takes a token and returns how long to wait for it"""
+    
+    def __init__(self, requests_per_minute: int):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = float(requests_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def reserve(self) -> float:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+RATE_LIMITER_CACHE_SIZE = 256
+_rate_limiters = OrderedDict()  # key digest -> _TokenBucket, least recently used first
+
+def _rate_limit_delay(api_key: str) -> float:
+    """Seconds to wait before the next request on this key (0 when limiting is off)"""
+    if GEMINI_REQUESTS_PER_MINUTE <= 0:
+        return 0.0
+    key_id = _key_id(api_key)
+    with _MODEL_CACHE_LOCK:
+        limiter = _rate_limiters.get(key_id)
+        if limiter is None:
+            limiter = _rate_limiters[key_id] = _TokenBucket(GEMINI_REQUESTS_PER_MINUTE)
+            if len(_rate_limiters) > RATE_LIMITER_CACHE_SIZE:
+                _rate_limiters.popitem(last=False)
+        else:
+            _rate_limiters.move_to_end(key_id)
+    return limiter.reserve()
+
+def _backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, 2**attempt)]"""
+    return random.uniform(0, min(GEMINI_RETRY_MAX_WAIT, 2 ** attempt))
+
+# Gemini Batch API jobs (half price, completed asynchronously within 24h)
+GEMINI_BATCH_POLL_INTERVAL = 30  # seconds
+_BATCH_DONE_STATES = frozenset(("JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED",
+                                "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"))
+# OpenAI Batch API jobs (same terms: half price, 24h completion window)
+OPENAI_BATCH_POLL_INTERVAL = 30  # seconds
+_OPENAI_BATCH_DONE_STATES = frozenset(("completed", "failed", "expired", "cancelled"))
+# OpenAI completion budget and per-call timeout (bounds slow outliers; SDK retries still apply)
+OPENAI_MAX_TOKENS = 4000
+_OPENAI_TOKENS_PER_SLIDE = 350
+_OPENAI_TOKENS_BASE = 500
+_OPENAI_DEFAULT_SLIDES = 12  # assumed when the slide count is not known
+OPENAI_TEMPERATURE = 0.3  # Lower temperature for more consistent formatting
+# Refinement calls are small and get a fixed timeout; full-deck generation gets one
+# scaled to its token budget at a conservative decoding rate
+OPENAI_REQUEST_TIMEOUT = 30  # seconds
+_OPENAI_MIN_TOKENS_PER_SECOND = 20
+# Models that accept response_format=json_object (the original gpt-4 does not)
+_OPENAI_JSON_MODE_MODELS = frozenset(("gpt-4o", "gpt-4o-mini", "gpt-4-turbo", "gpt-3.5-turbo"))
+
+def _openai_max_tokens(slide_count: int = None) -> int:
+    return min(OPENAI_MAX_TOKENS, (slide_count or _OPENAI_DEFAULT_SLIDES) * _OPENAI_TOKENS_PER_SLIDE + _OPENAI_TOKENS_BASE)
+
+def _openai_generation_timeout(max_tokens: int) -> float:
+    return max(OPENAI_REQUEST_TIMEOUT, max_tokens / _OPENAI_MIN_TOKENS_PER_SECOND)
+
+# Pooled HTTP session for AI Pipe so TCP/TLS connections are reused across calls
+AIPIPE_CHAT_URL = "https://aipipe.org/openrouter/v1/chat/completions"
+# Parallel per-slide refinement calls (above this many slides; fewer go in one request)
+AIPIPE_MAX_CONCURRENCY = int(os.getenv("AIPIPE_MAX_CONCURRENCY", 4))
+AIPIPE_SINGLE_REFINE_MAX = 2
+# AI Pipe completion budget: sized to the expected slide count, capped at the old fixed limit
+AIPIPE_MAX_TOKENS = 4000
+_AIPIPE_TOKENS_PER_SLIDE = 180
+_AIPIPE_TOKENS_BASE = 400
+_AIPIPE_DEFAULT_SLIDES = 12  # assumed when the slide count is not known
+AIPIPE_TEMPERATURE = 0.3
+
+def _aipipe_max_tokens(slide_count: int = None) -> int:
+    return min(AIPIPE_MAX_TOKENS, (slide_count or _AIPIPE_DEFAULT_SLIDES) * _AIPIPE_TOKENS_PER_SLIDE + _AIPIPE_TOKENS_BASE)
+
+# Transient AI Pipe failures are retried inside the session (Retry-After is honoured)
+AIPIPE_MAX_RETRIES = 5
+AIPIPE_BACKOFF_FACTOR = 0.5
+_RETRY_STATUSES = (429, 500, 502, 503, 504)
+_http_session = None
+_http_session_lock = threading.Lock()
+
+class _JitteredRetry(Retry):
+    """Exponential backoff with up to 50% random jitter (used when there is no Retry-After)"""
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return backoff + random.uniform(0, backoff / 2)
+
+def _get_http_session():
+    """Shared requests.Session with a small keep-alive connection pool and transient-error retries"""
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                session = requests.Session()
+                retries = _JitteredRetry(
+                    total=AIPIPE_MAX_RETRIES,
+                    backoff_factor=AIPIPE_BACKOFF_FACTOR,
+                    status_forcelist=_RETRY_STATUSES,
+                    allowed_methods=frozenset(["POST"]),
+                    respect_retry_after_header=True,
+                    raise_on_status=False
+                )
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retries)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _http_session = session
+    return _http_session
+
+# Longest source text sent to a model (same limit app.py applies to uploads);
+# slicing a shorter str returns it unchanged, so trimming needs no length check
+MAX_TEXT_CHARS = 60000
+
+# Limits applied to every parsed slide
+_TITLE_MAX = 100
+_SUBTITLE_MAX = 150
+_ITEM_MAX = 200
+_MAX_ITEMS = 6
+_VALID_SLIDE_TYPES = frozenset(("title", "content", "conclusion"))
+_SEPARATOR_RE = re.compile(r'\[NEXT_PLACEHOLDER\]|\[PLACEHOLDER\]|---|###|\[TEXT_AREA\]', re.IGNORECASE)
+
+def _validate_slide(slide: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate and clean individual slide data, keeping separator-marked content intact"""
+    slide_type = slide.get("slide_type", "content")
+    if slide_type not in _VALID_SLIDE_TYPES:
+        slide_type = "content"
+    validated = {
+        "slide_type": slide_type,
+        "title": str(slide.get("title", ""))[:_TITLE_MAX],
+        "subtitle": str(slide.get("subtitle", ""))[:_SUBTITLE_MAX],
+        "content": []
+    }
+    
+    # IMPORTANT: Title slides should NOT have content - only title and subtitle
+    content = slide.get("content", [])
+    if slide_type == "title" or not isinstance(content, list):
+        return validated
+    
+    # Separator markers mean multi-placeholder content, so the item count is not limited
+    has_separators = any(_SEPARATOR_RE.search(str(item)) for item in content)
+    if has_separators:
+        validated["content"] = [item.strip()[:_ITEM_MAX] for item in content if isinstance(item, str)]
+    else:
+        stripped = (item.strip() for item in content[:_MAX_ITEMS] if isinstance(item, str))
+        validated["content"] = [item[:_ITEM_MAX] for item in stripped if item]
+    
+    return validated
+
+# Static instructions of the standard (non-template) prompt. Sent as the system
+# message so the same prefix leads every request; see _build_messages.
+_BASE_SYSTEM_PROMPT = """
 You are a slide planner. Return JSON ONLY (no code fences, no Markdown), mapping the user's text into slides.
 
 INSTRUCTIONS:
@@ -45,6 +586,8 @@ INSTRUCTIONS:
 - If the source text is short, expand on the ideas with relevant context, examples, or implications. If the text is long, summarize and condense as needed.
 - Do not leave any content arrays empty. If you cannot find enough points, expand with logical, relevant, and non-repetitive information.
 - Do not use generic or filler statements. Avoid vague language. Be specific and actionable.
+- Use action verbs, concrete examples, and any data points, percentages, or metrics from the source text.
+- Open with a "title" slide (title and subtitle, no content) and close with a "conclusion" slide: summary title, action subtitle, and 3-5 key takeaways.
 - Do not output images, tables, or notes.
 
 CRITICAL REQUIREMENTS:
@@ -87,120 +630,167 @@ Return ONLY a valid JSON array with this exact structure:
         ]
     }
 ]
+"""
 
-SLIDE TYPES:
-- "title": Opening slide with main title and descriptive subtitle (both required)
-- "content": Regular content slide with title and 4-6 detailed bullet points (all required)
-- "conclusion": Final slide with summary title, action subtitle, and 3-5 key takeaways (all required)
+def _messages_text(messages: List[Dict[str, Any]]) -> str:
+    """Flatten chat messages (string or text-block content) into one string, e.g. for cache keys"""
+    texts = []
+    for message in messages:
+        content = message['content']
+        if not isinstance(content, str):
+            content = ''.join(block.get('text', '') for block in content)
+        texts.append(content)
+    return '\0'.join(texts)
 
-CONTENT GUIDELINES:
-- Titles: 10-60 characters, clear, descriptive, and engaging
-- Subtitles: 20-100 characters, provide valuable context, purpose, or key message
-- Bullet points: 40-140 characters each, complete sentences with substance
-- Each bullet must be a complete, informative sentence (not fragments, not '...')
-- Use action verbs, specific details, and concrete examples
-- Include data points, percentages, or metrics when available in source text
-- Avoid vague statements - be specific, informative, and actionable
-- Extract and expand on concrete information from the source text
-- If source text lacks detail, intelligently expand with relevant context
-- Ensure every slide has enough content to be meaningful and valuable
-"""
+# System message for requests whose instructions are all in the user prompt
+_DEFAULT_SYSTEM_MESSAGE = "You are an expert presentation designer. Always respond with valid JSON only."
 
-        if guidance:
-            base_prompt += f"\n\nADDITIONAL GUIDANCE: {guidance}\n"
-            base_prompt += "Apply this guidance to the tone, structure, and focus of the presentation.\n"
-        
-        if num_slides:
-            base_prompt += f"\n\nREQUIRED NUMBER OF SLIDES: {num_slides} (expand or condense as needed, but output exactly {num_slides} slides)"
-        base_prompt += f"\n\nTEXT TO CONVERT:\n{text_content}\n\n"
-        base_prompt += "Remember: Return ONLY the JSON array, no additional text or formatting."
-        return base_prompt
-    
-    def _build_template_aware_prompt(self, text_content: str, guidance: str, template_structure: Dict[str, Any], num_slides: int = None) -> str:
-        """Build a prompt that considers the actual template structure"""
-        
-        slides_info = template_structure.get('existing_slides', [])
-        prompt = f"""
+# OpenAI JSON mode only emits objects, so JSON-mode requests swap their system message
+# for one that asks for the slide array under a "slides" key
+_JSON_OBJECT_NOTE = 'Wherever the request says to return a JSON array, that array is the value of "slides".'
+_JSON_MODE_SYSTEM_MESSAGES = {
+    _BASE_SYSTEM_PROMPT: _BASE_SYSTEM_PROMPT.replace(
+        "Return ONLY a valid JSON array with this exact structure:",
+        'Return ONLY a valid JSON object {"slides": [...]} whose "slides" array has this exact structure.\n'
+        + _JSON_OBJECT_NOTE),
+    _DEFAULT_SYSTEM_MESSAGE: 'You are an expert presentation designer. Always respond with a valid JSON object '
+                             'of the form {"slides": [...]}. ' + _JSON_OBJECT_NOTE,
+}
+
+# Rendered template sections for _build_template_aware_prompt, keyed by slide-structure digest
+TEMPLATE_SECTION_CACHE_SIZE = 16
+_TEMPLATE_SECTION_CACHE = OrderedDict()
+_template_section_lock = threading.Lock()
+
+def _render_template_section(slides_info: List[Dict[str, Any]]) -> str:
+    """Template-derived part of the template-aware prompt: intro plus per-slide constraints"""
+    parts = [f"""
 You are an expert presentation designer. You need to create content for a PowerPoint presentation using an existing template.
 
 TEMPLATE STRUCTURE:
 The template has {len(slides_info)} existing slides that need to be populated with content.
 
 SLIDE DETAILS:
-"""
-        
-        # Add details about each slide
-        for slide in slides_info:
-            slide_idx = slide['slide_index']
-            slide_type = slide.get('suggested_content_type', 'content')
-            content_format = slide.get('content_format', None)
-
-            prompt += f"\n[SLIDE {slide_idx + 1}]\n"
-            prompt += f"- Suggested Type: {slide_type}\n"
-            prompt += f"- Layout: {slide['layout_name']}\n"
-
-            # Add placeholder reference text and length for LLM guidance
-            for ph in slide.get('placeholders', []):
-                ph_type = ph.get('type', '').upper()
-                ph_text = ph.get('text', '').strip()
-                ph_len = len(ph_text.split())
-                ph_name = ph.get('name', ph_type)
-                # Only count real content placeholders (not static markers)
-                import re
-                if not re.fullmatch(r'\d+|[ivxlc]+|[a-zA-Z]\.|•|\-|\–', str(ph_name).strip()):
-                    if ph_text:
-                        prompt += f"- Placeholder '{ph_name}': Example text: '{ph_text}' (about {ph_len} words, {len(ph_text)} characters). Match the style, tone, and keep your generated text within ±2 words or ±10 characters of this length.\n"
-
-            if slide['has_title']:
-                title_ph = next((p for p in slide['placeholders'] if 'TITLE' in p['type']), None)
-                if title_ph:
-                    if title_ph.get('actual_text_length', 0) > 0:
-                        prompt += f"- Title: Approximately {title_ph['actual_text_length']} characters (max {title_ph['max_chars_per_line']})\n"
-                    else:
-                        prompt += f"- Title: Max {title_ph['max_chars_per_line']} characters\n"
+"""]
+    
+    # Add details about each slide
+    for slide in slides_info:
+        slide_idx = slide['slide_index']
+        slide_type = slide.get('suggested_content_type', 'content')
+        content_format = slide.get('content_format', None)
 
-            if slide['has_subtitle']:
-                subtitle_ph = next((p for p in slide['placeholders'] if 'SUBTITLE' in p['type']), None)
-                if subtitle_ph:
-                    if subtitle_ph.get('actual_text_length', 0) > 0:
-                        prompt += f"- Subtitle: Approximately {subtitle_ph['actual_text_length']} characters total\n"
-                    else:
-                        prompt += f"- Subtitle: Max {subtitle_ph['max_chars_per_line']} characters per line, {subtitle_ph['suggested_lines']} lines\n"
-
-            if slide['has_content']:
-                content_phs = [p for p in slide['placeholders'] if 'CONTENT' in p['type'] or 'BODY' in p['type']]
-                n_content = len(content_phs)
-                format_str = ''
-                if n_content > 1:
-                    prompt += f"- This slide has {n_content} content placeholders. YOU MUST generate exactly {n_content} content items for this slide.\n"
-                    prompt += f"- If you generate fewer or more than {n_content} content items, your output will be rejected and extra items will be discarded.\n"
-                    prompt += f"- Each content placeholder should have a unique, meaningful point, and the length of each item must closely match the example/placeholder text.\n"
-                    prompt += f"- Structure your content array with '[NEXT_PLACEHOLDER]' as a separator between each content area.\n"
+        parts.append(f"\n[SLIDE {slide_idx + 1}]\n")
+        parts.append(f"- Suggested Type: {slide_type}\n")
+        parts.append(f"- Layout: {slide['layout_name']}\n")
+
+        # Classify placeholders in one pass. 'SUBTITLE' also contains 'TITLE', so
+        # title_ph is the first placeholder of either kind, as before.
+        title_ph = subtitle_ph = None
+        content_phs = []
+        for ph in slide.get('placeholders', []):
+            t = ph.get('type', '')
+            if 'TITLE' in t:
+                if title_ph is None:
+                    title_ph = ph
+                if subtitle_ph is None and 'SUBTITLE' in t:
+                    subtitle_ph = ph
+            if 'CONTENT' in t or 'BODY' in t:
+                content_phs.append(ph)
+
+        # Add placeholder reference text and length for LLM guidance
+        for ph in slide.get('placeholders', []):
+            ph_type = ph.get('type', '').upper()
+            ph_text = ph.get('text', '').strip()
+            ph_len = len(ph_text.split())
+            ph_name = ph.get('name', ph_type)
+            # Only count real content placeholders (not static markers)
+            if not _MARKER.fullmatch(str(ph_name).strip()):
+                if ph_text:
+                    parts.append(f"- Placeholder '{ph_name}': Example text: '{ph_text}' (about {ph_len} words, {len(ph_text)} characters). Match the style, tone, and keep your generated text within ±2 words or ±10 characters of this length.\n")
+
+        if slide['has_title']:
+            if title_ph:
+                if title_ph.get('actual_text_length', 0) > 0:
+                    parts.append(f"- Title: Approximately {title_ph['actual_text_length']} characters (max {title_ph['max_chars_per_line']})\n")
                 else:
-                    prompt += f"- This slide has 1 content placeholder. Generate exactly 1 content item, matching the length and style of the placeholder text.\n"
-                if content_phs:
-                    for idx, ph in enumerate(content_phs):
-                        if ph.get('text_format'):
-                            format_str = f" Format: {ph['text_format']}."
-                        if ph.get('line_count', 0) > 0:
-                            prompt += f"- Content for area {idx+1}:{format_str} {ph['line_count']} items/lines, max {ph['max_chars_per_line']} chars/line\n"
-                        else:
-                            prompt += f"- Content for area {idx+1}:{format_str} Max {ph['max_chars_per_line']} chars/line, up to {ph['suggested_lines']} lines\n"
-
-            # Add format-specific guidance
-            if content_format == 'numbered_list':
-                prompt += "  FORMAT: Use numbered list (1. 2. 3. etc.)\n"
-            elif content_format == 'bullet_list':
-                prompt += "  FORMAT: Use bullet points\n"
-            elif content_format == 'paragraph':
-                prompt += "  FORMAT: Use paragraph text (not bullet points)\n"
-        
-        if num_slides:
-            prompt += f"\nREQUIRED NUMBER OF SLIDES: {num_slides} (expand or condense as needed, but output exactly {num_slides} slides)\n"
-        prompt += f"""
+                    parts.append(f"- Title: Max {title_ph['max_chars_per_line']} characters\n")
+
+        if slide['has_subtitle']:
+            if subtitle_ph:
+                if subtitle_ph.get('actual_text_length', 0) > 0:
+                    parts.append(f"- Subtitle: Approximately {subtitle_ph['actual_text_length']} characters total\n")
+                else:
+                    parts.append(f"- Subtitle: Max {subtitle_ph['max_chars_per_line']} characters per line, {subtitle_ph['suggested_lines']} lines\n")
+
+        if slide['has_content']:
+            n_content = len(content_phs)
+            format_str = ''
+            if n_content > 1:
+                parts.append(f"- This slide has {n_content} content placeholders. YOU MUST generate exactly {n_content} content items for this slide.\n")
+                parts.append(f"- If you generate fewer or more than {n_content} content items, your output will be rejected and extra items will be discarded.\n")
+                parts.append(f"- Each content placeholder should have a unique, meaningful point, and the length of each item must closely match the example/placeholder text.\n")
+                parts.append(f"- Structure your content array with '[NEXT_PLACEHOLDER]' as a separator between each content area.\n")
+            else:
+                parts.append(f"- This slide has 1 content placeholder. Generate exactly 1 content item, matching the length and style of the placeholder text.\n")
+            if content_phs:
+                for idx, ph in enumerate(content_phs):
+                    if ph.get('text_format'):
+                        format_str = f" Format: {ph['text_format']}."
+                    if ph.get('line_count', 0) > 0:
+                        parts.append(f"- Content for area {idx+1}:{format_str} {ph['line_count']} items/lines, max {ph['max_chars_per_line']} chars/line\n")
+                    else:
+                        parts.append(f"- Content for area {idx+1}:{format_str} Max {ph['max_chars_per_line']} chars/line, up to {ph['suggested_lines']} lines\n")
+
+        # Add format-specific guidance
+        if content_format == 'numbered_list':
+            parts.append("  FORMAT: Use numbered list (1. 2. 3. etc.)\n")
+        elif content_format == 'bullet_list':
+            parts.append("  FORMAT: Use bullet points\n")
+        elif content_format == 'paragraph':
+            parts.append("  FORMAT: Use paragraph text (not bullet points)\n")
+    
+    return ''.join(parts)
+
+def _template_section(slides_info: List[Dict[str, Any]]) -> str:
+    """_render_template_section memoized by a digest of the slide structure"""
+    # Only the analysis fields: underscore keys are memos ('_cats', '_refine_reqs', ...)
+    # that later passes add to these same slide dicts
+    analysis = [{k: v for k, v in slide.items() if not k.startswith('_')} for slide in slides_info]
+    key = hashlib.blake2b(json.dumps(analysis, sort_keys=True, default=str).encode('utf-8'),
+                          digest_size=16).digest()
+    with _template_section_lock:
+        section = _TEMPLATE_SECTION_CACHE.get(key)
+        if section is not None:
+            _TEMPLATE_SECTION_CACHE.move_to_end(key)
+            return section
+    section = _render_template_section(slides_info)
+    with _template_section_lock:
+        _TEMPLATE_SECTION_CACHE[key] = section
+        while len(_TEMPLATE_SECTION_CACHE) > TEMPLATE_SECTION_CACHE_SIZE:
+            _TEMPLATE_SECTION_CACHE.popitem(last=False)
+    return section
+
+def _template_section_for(template_structure: Dict[str, Any]) -> str:
+    """
+    Template section for template_structure, memoized on it as '_prompt_section'
+    
+    Repeat builds for the same analysis (generation, then refinement) reuse the
+    text without re-serializing existing_slides to look it up in the digest cache.
+    """
+    slides_info = template_structure.get('existing_slides', [])
+    memo = template_structure.get('_prompt_section')
+    if memo is not None and memo['slides'] is slides_info and memo['count'] == len(slides_info):
+        return memo['text']
+    
+    section = _template_section(slides_info)
+    template_structure['_prompt_section'] = {'slides': slides_info, 'count': len(slides_info), 'text': section}
+    return section
+
+# Task/requirements/output block of the template-aware prompt, formatted with the slide count
+_TEMPLATE_TASK_FMT = """
 
 YOUR TASK:
-1. Create content for EXACTLY {len(slides_info)} slides
+1. Create content for EXACTLY {slide_count} slides
 2. Each slide must match the constraints and format patterns listed above
 3. Keep titles concise and impactful (fit within character limits)
 4. Match the detected format (numbered list, bullet list, or paragraph) for each slide
@@ -208,7 +798,7 @@ YOUR TASK:
 6. If a placeholder should be empty (no subtitle needed), set it to null or empty string
 
 CRITICAL REQUIREMENTS:
-- Generate content for ALL {len(slides_info)} slides
+- Generate content for ALL {slide_count} slides
 - Respect the EXACT character and line limits for each placeholder
 - Follow the FORMAT specified for each slide (numbered/bullet/paragraph)
 - Use the suggested slide types (title, content, conclusion) appropriately
@@ -233,7 +823,7 @@ MULTIPLE TEXT PLACEHOLDERS:
   ]
 
 OUTPUT FORMAT:
-Return a JSON array with EXACTLY {len(slides_info)} slide objects:
+Return a JSON array with EXACTLY {slide_count} slide objects:
 
 [
     {{
@@ -246,31 +836,26 @@ Return a JSON array with EXACTLY {len(slides_info)} slide objects:
     ...
 ]
 """
-        
-        if guidance:
-            prompt += f"\nADDITIONAL GUIDANCE: {guidance}\n"
-        
-        prompt += f"\nTEXT TO CONVERT:\n{text_content}\n\n"
-        prompt += "Return ONLY the JSON array, no additional text."
-        
-        return prompt
-    
-    def _build_initial_content_prompt(self, text_content: str, guidance: str, num_slides: int = None) -> str:
-        """Build prompt for initial content generation with optional slide count constraint"""
-        
-        if num_slides:
-            prompt = f"""
-You are an expert presentation designer. Convert the provided text into EXACTLY {num_slides} presentation slides.
 
-You MUST generate exactly {num_slides} slides total, including:
+# Request-specific blocks of the standard prompt
+_GUIDANCE_FMT = ("\n\nADDITIONAL GUIDANCE: {guidance}\n"
+                 "Apply this guidance to the tone, structure, and focus of the presentation.\n")
+_NUM_SLIDES_FMT = "\n\nREQUIRED NUMBER OF SLIDES: {n} (expand or condense as needed, but output exactly {n} slides)"
+_USER_PROMPT_TAIL = "Remember: Return ONLY the JSON array, no additional text or formatting."
+
+# Skeletons of the pass-1 (initial content) prompt: one header per slide-count mode, then the format rules
+_INITIAL_COUNT_HEADER = """
+You are an expert presentation designer. Convert the provided text into EXACTLY {n} presentation slides.
+
+You MUST generate exactly {n} slides total, including:
 - 1 title slide (with engaging title and descriptive subtitle)
-- {num_slides - 2} content slides (covering key points from the text)
+- {content_slides} content slides (covering key points from the text)
 - 1 conclusion slide (with key takeaways)
 
-Adjust the content distribution to fit exactly {num_slides} slides. If the text is short, expand on ideas. If long, condense appropriately.
+Adjust the content distribution to fit exactly {n} slides. If the text is short, expand on ideas. If long, condense appropriately.
 """
-        else:
-            prompt = """
+
+_INITIAL_OPEN_HEADER = """
 You are an expert presentation designer. Convert the provided text into presentation slides.
 
 Generate a comprehensive presentation with:
@@ -278,8 +863,8 @@ Generate a comprehensive presentation with:
 - Multiple content slides covering all key points from the text
 - A conclusion slide with key takeaways
 """
-        
-        prompt += """
+
+_INITIAL_FORMAT_RULES = """
 
 Focus on extracting important information from the text.
 
@@ -315,58 +900,243 @@ DO NOT use markdown formatting.
 DO NOT add comments.
 Just the JSON array.
 """
+
+class BaseLLMProvider:
+    """Base class for LLM providers"""
+    
+    def __init__(self, api_key: str, model_name: str = None):
+        self.api_key = api_key
+        self.model_name = model_name
+    
+    def _cache_key(self, prompt: str) -> str:
+        # Provider class too: AI Pipe and OpenAI share model names and message formats.
+        # Scoped per API key so one user's decks are never served to another.
+        key = f"{type(self).__name__}\0{_key_id(self.api_key or '')}\0{self.model_name}\0{prompt}"
+        return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+    
+    def _cache_path(self, prompt: str, suffix: str = 'txt') -> str:
+        return os.path.join(LLM_RESPONSE_CACHE_DIR, f"{self._cache_key(prompt)}.{suffix}")
+    
+    def _memory_cache_get(self, key: str) -> Optional[str]:
+        with _memory_cache_lock:
+            entry = _memory_cache.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[0] > LLM_RESPONSE_CACHE_TTL:
+                del _memory_cache[key]
+                return None
+            _memory_cache.move_to_end(key)
+            return entry[1]
+    
+    def _memory_cache_put(self, key: str, response_text: str) -> None:
+        with _memory_cache_lock:
+            _memory_cache[key] = (time.time(), response_text)
+            _memory_cache.move_to_end(key)
+            while len(_memory_cache) > LLM_MEMORY_CACHE_SIZE:
+                _memory_cache.popitem(last=False)
+    
+    def _read_cache_file(self, cache_path: str) -> Optional[str]:
+        try:
+            if time.time() - os.path.getmtime(cache_path) > LLM_RESPONSE_CACHE_TTL:
+                return None
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+    
+    def _write_cache_file(self, cache_path: str, data: str) -> None:
+        try:
+            os.makedirs(LLM_RESPONSE_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning("Could not write LLM response cache entry: %s", e)
+        _maybe_prune_response_cache()
+    
+    @staticmethod
+    def _cache_enabled(temperature: Optional[float]) -> bool:
+        """Whether responses sampled at this temperature (None: model default) may be cached"""
+        return LLM_CACHE_MODE != 'off' and temperature is not None and temperature <= LLM_CACHE_MAX_TEMPERATURE
+    
+    def _cache_get(self, prompt: str, source_text: str = None, temperature: float = None) -> Optional[str]:
+        """
+        Return a cached response for this prompt, if caching is on
+        
+        Args:
+            prompt: Full prompt sent to the model
+            source_text: The user text embedded in the prompt; enables near-duplicate
+                lookups in generative mode
+            temperature: Sampling temperature of the request; see LLM_CACHE_MAX_TEMPERATURE
+            
+        Returns:
+            Cached response text, or None on a miss
+        """
+        if not self._cache_enabled(temperature):
+            return None
+        key = self._cache_key(prompt)
+        response_text = self._memory_cache_get(key)
+        if response_text is None:
+            response_text = self._read_cache_file(os.path.join(LLM_RESPONSE_CACHE_DIR, f"{key}.txt"))
+            if response_text is not None:
+                self._memory_cache_put(key, response_text)
+        if response_text is not None:
+            logger.info("LLM response cache hit for %s", self.model_name)
+            return response_text
+        
+        if LLM_CACHE_MODE != 'generative' or not source_text or source_text not in prompt:
+            return None
+        bucket = self._read_cache_file(self._cache_path(prompt.replace(source_text, '\0'), 'bucket'))
+        if bucket is None:
+            return None
+        try:
+            entries = json.loads(bucket)
+        except ValueError:
+            return None
+        
+        shingles = _text_shingles(source_text)
+        best_score, best_response = 0.0, None
+        for entry in entries:
+            other = set(entry['shingles'])
+            score = len(shingles & other) / (len(shingles | other) or 1)
+            if score > best_score:
+                best_score, best_response = score, entry['response']
+        if best_score >= LLM_CACHE_SIMILARITY:
+            logger.info("LLM generative cache hit for %s (similarity %.2f)", self.model_name, best_score)
+            return best_response
+        return None
+    
+    def _cache_put(self, prompt: str, response_text: str, source_text: str = None, temperature: float = None) -> None:
+        """Store a response for this prompt (and its skeleton in generative mode), if caching is on"""
+        if not self._cache_enabled(temperature) or not response_text:
+            return
+        key = self._cache_key(prompt)
+        self._memory_cache_put(key, response_text)
+        self._write_cache_file(os.path.join(LLM_RESPONSE_CACHE_DIR, f"{key}.txt"), response_text)
+        
+        if LLM_CACHE_MODE != 'generative' or not source_text or source_text not in prompt:
+            return
+        bucket_path = self._cache_path(prompt.replace(source_text, '\0'), 'bucket')
+        try:
+            entries = json.loads(self._read_cache_file(bucket_path) or '[]')
+        except ValueError:
+            entries = []
+        entries.append({'shingles': sorted(_text_shingles(source_text)), 'response': response_text})
+        self._write_cache_file(bucket_path, json.dumps(entries[-LLM_CACHE_BUCKET_SIZE:]))
+    
+    def parse_text_to_slides(self, text_content: str, guidance: str = "", template_structure: Dict[str, Any] = None, num_slides: int = None) -> List[Dict[str, Any]]:
+        """Parse input text into structured slide content, enforcing text length and slide count"""
+        # Enforce text character limit (same as app.py)
+        if text_content:
+            text_content = text_content[:MAX_TEXT_CHARS]
+        # Build prompt with slide count if provided
+        prompt = self._build_prompt(text_content, guidance, template_structure, num_slides=num_slides)
+        # Actual LLM call is implemented in subclasses
+        raise NotImplementedError("Subclasses must implement parse_text_to_slides")
+    
+    def _build_prompt(self, text_content: str, guidance: str, template_structure: Dict[str, Any] = None, num_slides: int = None) -> str:
+        """Build the prompt for the LLM - shared across providers"""
+        
+        # If template structure is provided, create a customized prompt
+        if template_structure and 'existing_slides' in template_structure:
+            return self._build_template_aware_prompt(text_content, guidance, template_structure, num_slides)
+        
+        # Otherwise use the standard prompt
+        return _BASE_SYSTEM_PROMPT + self._build_user_prompt(text_content, guidance, num_slides)
+    
+    def _build_user_prompt(self, text_content: str, guidance: str, num_slides: int = None) -> str:
+        """Request-specific part of the standard prompt (follows _BASE_SYSTEM_PROMPT)"""
+        parts = []
+        if guidance:
+            parts.append(_GUIDANCE_FMT.format(guidance=guidance))
+        if num_slides:
+            parts.append(_NUM_SLIDES_FMT.format(n=num_slides))
+        parts.append(f"\n\nTEXT TO CONVERT:\n{text_content}\n\n")
+        parts.append(_USER_PROMPT_TAIL)
+        return ''.join(parts)
+    
+    def _build_messages(self, text_content: str, guidance: str, template_structure: Dict[str, Any] = None, num_slides: int = None) -> List[Dict[str, Any]]:
+        """
+        Chat messages for a slide request, static instructions first
+        
+        For the standard prompt the instructions go in the system message and only
+        the guidance, slide count and source text in the user message, so the
+        system prefix is byte-identical across calls and hits provider prompt caching.
+        """
+        if template_structure and 'existing_slides' in template_structure:
+            return [
+                {"role": "system", "content": _DEFAULT_SYSTEM_MESSAGE},
+                {"role": "user", "content": self._build_template_aware_prompt(text_content, guidance, template_structure, num_slides)}
+            ]
+        system_content = _BASE_SYSTEM_PROMPT
+        if self.model_name and self.model_name.startswith("anthropic/"):
+            # Anthropic only caches prefixes that are marked explicitly
+            system_content = [{"type": "text", "text": _BASE_SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}]
+        return [
+            {"role": "system", "content": system_content},
+            {"role": "user", "content": self._build_user_prompt(text_content, guidance, num_slides)}
+        ]
+    
+    def _build_template_aware_prompt(self, text_content: str, guidance: str, template_structure: Dict[str, Any], num_slides: int = None) -> str:
+        """Build a prompt that considers the actual template structure"""
+        
+        slides_info = template_structure.get('existing_slides', [])
+        # The template description is identical for every request on the same template
+        parts = [_template_section_for(template_structure)]
+        
+        if num_slides:
+            parts.append(f"\nREQUIRED NUMBER OF SLIDES: {num_slides} (expand or condense as needed, but output exactly {num_slides} slides)\n")
+        parts.append(_TEMPLATE_TASK_FMT.format(slide_count=len(slides_info)))
+        
+        if guidance:
+            parts.append(f"\nADDITIONAL GUIDANCE: {guidance}\n")
+        
+        parts.append(f"\nTEXT TO CONVERT:\n{text_content}\n\n")
+        parts.append("Return ONLY the JSON array, no additional text.")
+        
+        return ''.join(parts)
+    
+    def _build_initial_content_prompt(self, text_content: str, guidance: str, num_slides: int = None) -> str:
+        """Build prompt for initial content generation with optional slide count constraint"""
+        
+        if num_slides:
+            parts = [_INITIAL_COUNT_HEADER.format(n=num_slides, content_slides=num_slides - 2)]
+        else:
+            parts = [_INITIAL_OPEN_HEADER]
+        parts.append(_INITIAL_FORMAT_RULES)
+        
         if guidance:
-            prompt += f"\nGUIDANCE: {guidance}\n"
+            parts.append(f"\nGUIDANCE: {guidance}\n")
         
         if num_slides:
-            prompt += f"\nREMEMBER: You MUST generate EXACTLY {num_slides} slides total.\n"
+            parts.append(f"\nREMEMBER: You MUST generate EXACTLY {num_slides} slides total.\n")
         
-        prompt += f"\nTEXT TO CONVERT:\n{text_content}\n\n"
-        prompt += "Return ONLY the JSON array."
-        return prompt
+        parts.append(f"\nTEXT TO CONVERT:\n{text_content}\n\n")
+        parts.append("Return ONLY the JSON array.")
+        return ''.join(parts)
     
     def _build_refinement_prompt(self, mapped_content: List[Dict[str, Any]], 
                                 template_structure: Dict[str, Any],
                                 selected_indices: List[int]) -> str:
         """Build prompt to refine content for specific template slides"""
-        prompt = """You need to refine presentation content to perfectly fit template constraints.
-
-For each slide below, adjust the content to match the exact requirements:
-
-"""
-        
-        for i, (content, idx) in enumerate(zip(mapped_content, selected_indices)):
-            template_slide = template_structure['existing_slides'][idx]
-            prompt += f"\n[SLIDE {i+1}]\n"
-            prompt += f"Current content:\n"
-            prompt += f"- Title: {content.get('title', '')}\n"
-            prompt += f"- Subtitle: {content.get('subtitle', '')}\n"
-            prompt += f"- Content items: {len(content.get('content', []))}\n"
-            
-            prompt += f"\nTemplate requirements:\n"
-            for ph in template_slide.get('placeholders', []):
-                if 'TITLE' in ph.get('type', ''):
-                    prompt += f"- Title: max {ph.get('max_chars_per_line', 60)} chars\n"
-                elif 'SUBTITLE' in ph.get('type', ''):
-                    prompt += f"- Subtitle: max {ph.get('max_chars_per_line', 100)} chars\n"
-                elif 'CONTENT' in ph.get('type', '') or 'BODY' in ph.get('type', ''):
-                    format_type = ph.get('text_format', 'bullet_list')
-                    prompt += f"- Content: {format_type}, max {ph.get('suggested_lines', 5)} items, "
-                    prompt += f"{ph.get('max_chars_per_line', 80)} chars/line\n"
-                    
-                    if format_type == 'numbered_list':
-                        prompt += "  FORMAT: Use numbered list (1. 2. 3.)\n"
-                    elif format_type == 'paragraph':
-                        prompt += "  FORMAT: Use paragraph text, not bullets\n"
-        
-        prompt += """\n\nReturn a JSON array with refined content for each slide.
-Ensure all text fits within the constraints and follows the specified format.
-Return ONLY the JSON array.
-"""
-        return prompt
+        return _build_refinement_prompt(mapped_content, template_structure, selected_indices)
     
     def _parse_response(self, response_text: str) -> List[Dict[str, Any]]:
         """Parse and validate Gemini's JSON response with better error handling"""
+        # One scan finds the first balanced [...] (past any fence or prose); well-formed
+        # JSON is decoded straight from it, only malformed output gets the cleanup below
+        candidate = _extract_json_array(response_text)
+        if candidate is not None:
+            try:
+                slide_data = _loads(candidate)
+            except json.JSONDecodeError:
+                slide_data = None
+            if isinstance(slide_data, list) and slide_data and all(isinstance(slide, dict) for slide in slide_data):
+                validated_slides = _validate_in_place(slide_data, self._validate_slide)
+                logger.info("Successfully parsed %d slides", len(validated_slides))
+                return validated_slides
+        
         try:
             # Store original for debugging
             original_response = response_text
@@ -388,12 +1158,8 @@ Return ONLY the JSON array.
             
             response_text = response_text.strip()
             
-            # Remove any trailing commas that might cause JSON errors
-            import re
-            # Fix trailing commas in arrays
-            response_text = re.sub(r',\s*]', ']', response_text)
-            # Fix trailing commas in objects
-            response_text = re.sub(r',\s*}', '}', response_text)
+            # Remove any trailing commas (in arrays and objects) that might cause JSON errors
+            response_text = _TRAILING_COMMA.sub(r'\1', response_text)
             
             # Fix common JSON formatting issues
             # Replace single quotes with double quotes if needed
@@ -414,7 +1180,7 @@ Return ONLY the JSON array.
                     response_text = response_text[:array_end + 1]
             
             # Parse JSON
-            slide_data = json.loads(response_text)
+            slide_data = _loads(response_text)
             
             # Validate structure
             if not isinstance(slide_data, list):
@@ -428,26 +1194,26 @@ Return ONLY the JSON array.
                 validated_slide = self._validate_slide(slide)
                 validated_slides.append(validated_slide)
             
-            logger.info(f"Successfully parsed {len(validated_slides)} slides")
+            logger.info("Successfully parsed %d slides", len(validated_slides))
             return validated_slides
             
         except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON response: {e}")
-            logger.error(f"Problematic response text (first 500 chars): {response_text[:500]}")
+            logger.error("Failed to parse JSON response: %s", e)
+            if logger.isEnabledFor(logging.ERROR):
+                logger.error("Problematic response text (first 500 chars): %s", response_text[:500])
             
             # Try one more time with aggressive cleaning
             try:
                 # Extract JSON array more aggressively
-                import re
-                json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
+                json_match = _JSON_ARR.search(response_text)
                 if json_match:
                     cleaned_json = json_match.group(0)
-                    slide_data = json.loads(cleaned_json)
+                    slide_data = _loads(cleaned_json)
                     validated_slides = []
                     for slide in slide_data:
                         validated_slide = self._validate_slide(slide)
                         validated_slides.append(validated_slide)
-                    logger.info(f"Successfully parsed {len(validated_slides)} slides after aggressive cleaning")
+                    logger.info("Successfully parsed %d slides after aggressive cleaning", len(validated_slides))
                     return validated_slides
             except:
                 pass
@@ -456,7 +1222,7 @@ Return ONLY the JSON array.
             logger.warning("Using fallback slide generation")
             return self._create_fallback_slides(response_text)
         except Exception as e:
-            logger.error(f"Error parsing response: {e}")
+            logger.error("Error parsing response: %s", e)
             raise Exception(f"Failed to parse Gemini response: {str(e)}")
     
     def _validate_slide(self, slide: Dict[str, Any]) -> Dict[str, Any]:
@@ -485,19 +1251,8 @@ Return ONLY the JSON array.
         """Create basic slides when JSON parsing fails"""
         logger.warning("Creating fallback slides due to parsing error")
         
-        # Split text into chunks
-        sentences = text.split('. ')
-        chunks = []
-        current_chunk = []
-        
-        for sentence in sentences:
-            current_chunk.append(sentence)
-            if len(current_chunk) >= 3:  # 3 sentences per slide
-                chunks.append('. '.join(current_chunk))
-                current_chunk = []
-        
-        if current_chunk:
-            chunks.append('. '.join(current_chunk))
+        # Split text into chunks of 3 sentences per slide (max 10 content slides)
+        chunks = _sentence_chunks(text)
         
         slides = []
         
@@ -528,98 +1283,10 @@ Return ONLY the JSON array.
         
         return slides
 
-class GeminiProvider:
-    """Google Gemini API provider for text parsing and slide generation"""
-    
-    def __init__(self, api_key: str, model_name: str = 'gemini-2.5-pro'):
-        """Initialize Gemini provider with API key and model name"""
-        self.api_key = api_key
-        self.model_name = model_name or 'gemini-2.5-pro'
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(self.model_name)
-    
-    def parse_text_to_slides(self, text_content: str, guidance: str = "", template_structure: Dict[str, Any] = None, num_slides: int = None) -> List[Dict[str, Any]]:
-        """
-        Parse input text into structured slide content using Gemini with two-pass generation
-        
-        Args:
-            text_content: The input text to be converted
-            guidance: Optional guidance for tone/structure
-            template_structure: Optional template structure information
-            num_slides: Target number of slides to generate
-            
-        Returns:
-            List of slide dictionaries with structure and content
-        """
-        try:
-            # First pass: Generate initial content
-            if template_structure and 'existing_slides' in template_structure:
-                # If we have a template, do intelligent two-pass generation
-                logger.info("Starting two-pass content generation with template awareness")
-                # Pass 1: Generate initial content WITH num_slides constraint
-                initial_prompt = self._build_initial_content_prompt(text_content, guidance, num_slides)
-                logger.info(f"Pass 1: Generating initial content (target: {num_slides} slides)" if num_slides else "Pass 1: Generating initial content")
-                initial_response = self.model.generate_content(initial_prompt)
-                initial_slides = self._parse_response(initial_response.text)
-                
-                # Map content to best template slides
-                from .content_mapper import ContentMapper
-                mapper = ContentMapper()
-                mapped_content, selected_indices = mapper.map_content_to_template(
-                    initial_slides, template_structure
-                )
-                
-                # Pass 2: Refine content for selected slides
-                if mapped_content:
-                    logger.info("Pass 2: Refining content for selected template slides")
-                    refined_prompt = self._build_refinement_prompt(
-                        mapped_content, template_structure, selected_indices
-                    )
-                    refined_response = self.model.generate_content(refined_prompt)
-                    final_slides = self._parse_response(refined_response.text)
-                    
-                    # Merge refinements with mapped content, keeping original content if refinement fails
-                    for i, slide in enumerate(final_slides[:len(mapped_content)]):
-                        if i < len(mapped_content):
-                            # Keep the original content if the refined version is empty
-                            if slide.get('content') or mapped_content[i].get('content') is None:
-                                mapped_content[i]['content'] = slide.get('content', mapped_content[i].get('content', []))
-                            if slide.get('title'):
-                                mapped_content[i]['title'] = slide.get('title')
-                            if slide.get('subtitle'):
-                                mapped_content[i]['subtitle'] = slide.get('subtitle')
-                    
-                    # Log the actual content being returned
-                    for idx, content in enumerate(mapped_content):
-                        logger.debug(f"Slide {idx+1} final content: title='{content.get('title')}', "
-                                   f"subtitle='{content.get('subtitle')}', "
-                                   f"content={content.get('content', [])}")
-                    
-                    logger.info(f"Generated and refined {len(mapped_content)} slides")
-                    return mapped_content
-                else:
-                    return initial_slides
-            else:
-                # Single pass for non-template generation
-                prompt = self._build_prompt(text_content, guidance, template_structure, num_slides=num_slides)
-                logger.info("Sending request to Gemini API")
-                response = self.model.generate_content(prompt)
-                slide_structure = self._parse_response(response.text)
-                logger.info(f"Generated {len(slide_structure)} slides")
-                return slide_structure
-            
-        except Exception as e:
-            logger.error(f"Error with Gemini API: {str(e)}")
-            raise Exception(f"Failed to process text with Gemini: {str(e)}")
-    
-    def _build_prompt(self, text_content: str, guidance: str, template_structure: Dict[str, Any] = None, num_slides: int = None) -> str:
-        """Build the prompt for Gemini API"""
-        
-        # If template structure is provided, use template-aware prompt
-        if template_structure and 'existing_slides' in template_structure:
-            return self._build_template_aware_prompt(text_content, guidance, template_structure, num_slides)
-        
-        base_prompt = """
+# Static instructions for single-pass slide planning. Sent as the Gemini system
+# instruction so the unchanging prefix is shared across requests (and eligible
+# for the API's implicit prefix caching); only the tail varies per call.
+_PLANNER_INSTRUCTIONS_VERBOSE = """
 You are an expert presentation designer. Your task is to analyze the provided text and convert it into a structured PowerPoint presentation.
 
 INSTRUCTIONS:
@@ -694,156 +1361,34 @@ CONTENT GUIDELINES:
 - Ensure every slide has enough content to be meaningful and valuable
 """
 
-        if guidance:
-            base_prompt += f"\n\nADDITIONAL GUIDANCE: {guidance}\n"
-            base_prompt += "Apply this guidance to the tone, structure, and focus of the presentation.\n"
-        
-        if num_slides:
-            base_prompt += f"\n\nREQUIRED NUMBER OF SLIDES: {num_slides} (expand or condense as needed, but output exactly {num_slides} slides)\n"
-        
-        base_prompt += f"\n\nTEXT TO CONVERT:\n{text_content}\n\n"
-        base_prompt += "Remember: Return ONLY the JSON array, no additional text or formatting."
-        
-        return base_prompt
-    
-    def _build_template_aware_prompt(self, text_content: str, guidance: str, template_structure: Dict[str, Any], num_slides: int = None) -> str:
-        """Build a prompt that considers the actual template structure"""
-        
-        slides_info = template_structure.get('existing_slides', [])
-        
-        prompt = f"""
-You are an expert presentation designer. You need to create content for a PowerPoint presentation using an existing template.
+# Terse variant of the planner rules (same schema, ~60% fewer tokens)
+_PLANNER_INSTRUCTIONS_COMPACT = """
+Convert the text into PowerPoint slides.
 
-TEMPLATE STRUCTURE:
-The template has {len(slides_info)} existing slides that need to be populated with content.
+RULES:
+- Slides: 1 title, logical content slides (typically 7-15), 1 conclusion
+- title slide: title 10-60 chars, subtitle 20-100 chars, content []
+- content slide: title 10-60 chars, subtitle "", 4-6 bullets
+- conclusion slide: title, subtitle, 3-5 specific actionable takeaways
+- bullets: 40-140 chars; complete sentences; no ellipses; no filler; never "None"/"N/A"
+- Use concrete facts, data and examples from the text; expand short text with relevant context
 
-SLIDE DETAILS:
+OUTPUT: JSON array only, no markdown:
+[{slide_type:'title|content|conclusion',title:str,subtitle:str,content:[str]}]
 """
-        
-        # Add details about each slide
-        for slide in slides_info:
-            slide_idx = slide['slide_index']
-            slide_type = slide.get('suggested_content_type', 'content')
-            content_format = slide.get('content_format', None)
-            
-            prompt += f"\n[SLIDE {slide_idx + 1}]\n"
-            prompt += f"- Suggested Type: {slide_type}\n"
-            prompt += f"- Layout: {slide['layout_name']}\n"
-            
-            if slide['has_title']:
-                title_ph = next((p for p in slide['placeholders'] if 'TITLE' in p['type']), None)
-                if title_ph:
-                    # Use actual text length if available, otherwise use calculated max
-                    if title_ph.get('actual_text_length', 0) > 0:
-                        prompt += f"- Title: Approximately {title_ph['actual_text_length']} characters (max {title_ph['max_chars_per_line']})\n"
-                    else:
-                        prompt += f"- Title: Max {title_ph['max_chars_per_line']} characters\n"
-            
-            if slide['has_subtitle']:
-                subtitle_ph = next((p for p in slide['placeholders'] if 'SUBTITLE' in p['type']), None)
-                if subtitle_ph:
-                    if subtitle_ph.get('actual_text_length', 0) > 0:
-                        prompt += f"- Subtitle: Approximately {subtitle_ph['actual_text_length']} characters total\n"
-                    else:
-                        prompt += f"- Subtitle: Max {subtitle_ph['max_chars_per_line']} characters per line, {subtitle_ph['suggested_lines']} lines\n"
-            
-            if slide['has_content']:
-                content_ph = next((p for p in slide['placeholders'] if 'CONTENT' in p['type'] or 'BODY' in p['type']), None)
-                if content_ph:
-                    format_str = ""
-                    if content_ph.get('text_format'):
-                        format_str = f" Format: {content_ph['text_format']}."
-                    
-                    if content_ph.get('line_count', 0) > 0:
-                        prompt += f"- Content:{format_str} {content_ph['line_count']} items/lines, "
-                        prompt += f"max {content_ph['max_chars_per_line']} chars/line\n"
-                    else:
-                        prompt += f"- Content:{format_str} Max {content_ph['max_chars_per_line']} chars/line, "
-                        prompt += f"up to {content_ph['suggested_lines']} lines\n"
-            
-            # Add format-specific guidance
-            if content_format == 'numbered_list':
-                prompt += "  FORMAT: Use numbered list (1. 2. 3. etc.)\n"
-            elif content_format == 'bullet_list':
-                prompt += "  FORMAT: Use bullet points\n"
-            elif content_format == 'paragraph':
-                prompt += "  FORMAT: Use paragraph text (not bullet points)\n"
-        
-        # Add num_slides requirement if specified
-        if num_slides:
-            prompt += f"\n\nIMPORTANT: You must generate content for EXACTLY {num_slides} slides from the available {len(slides_info)} template slides.\n"
-            prompt += f"Select the most appropriate {num_slides} slides from the template to match your content.\n"
-        
-        prompt += f"""
-
-YOUR TASK:
-1. Create content for EXACTLY {num_slides if num_slides else len(slides_info)} slides
-2. Each slide must match the constraints and format patterns listed above
-3. Keep titles concise and impactful (fit within character limits)
-4. Match the detected format (numbered list, bullet list, or paragraph) for each slide
-5. Do not exceed the character limits for each placeholder
-6. If a placeholder should be empty (no subtitle needed), set it to null or empty string
-
-CRITICAL REQUIREMENTS:
-- Generate content for {num_slides if num_slides else 'ALL ' + str(len(slides_info))} slides
-- Respect the EXACT character and line limits for each placeholder
-- Follow the FORMAT specified for each slide (numbered/bullet/paragraph)
-- Use the suggested slide types (title, content, conclusion) appropriately
-- Make titles short and punchy to avoid text overflow
-- For numbered lists: Start each item with "1. ", "2. ", etc.
-- For bullet lists: Create concise bullet points
-- For paragraphs: Write flowing text without bullet points
-- Set content to null or empty if a placeholder shouldn't have content
 
-OUTPUT FORMAT:
-Return a JSON array with EXACTLY {num_slides if num_slides else len(slides_info)} slide objects:
+# Closing line of the single-pass prompt, after the source text
+_TAIL = "Remember: Return ONLY the JSON array, no additional text or formatting."
 
-[
-    {{
-        "slide_number": 1,
-        "slide_type": "title/content/conclusion",
-        "title": "Short title (respect char limit)",
-        "subtitle": "Brief subtitle or null if not needed",
-        "content": ["Point 1", "Point 2", ...] or null
-    }},
-    ...
-]
-"""
-        
-        if guidance:
-            prompt += f"\nADDITIONAL GUIDANCE: {guidance}\n"
-        
-        prompt += f"\nTEXT TO CONVERT:\n{text_content}\n\n"
-        prompt += "Return ONLY the JSON array, no additional text."
-        
-        return prompt
-    
-    def _build_initial_content_prompt(self, text_content: str, guidance: str, num_slides: int = None) -> str:
-        """Build prompt for initial content generation with optional slide count constraint"""
-        
-        if num_slides:
-            prompt = f"""
-You are an expert presentation designer. Convert the provided text into EXACTLY {num_slides} presentation slides.
+# A/B toggle for the single-pass prompt: "verbose" (default) or "compact"
+PROMPT_STYLE = os.getenv("PROMPT_STYLE", "verbose").lower()
+_PLANNER_INSTRUCTIONS = (_PLANNER_INSTRUCTIONS_COMPACT if PROMPT_STYLE == "compact"
+                         else _PLANNER_INSTRUCTIONS_VERBOSE)
 
-You MUST generate exactly {num_slides} slides total, including:
-- 1 title slide (with engaging title and descriptive subtitle)
-- {num_slides - 2} content slides (covering key points from the text)
-- 1 conclusion slide (with key takeaways)
-
-Adjust the content distribution to fit exactly {num_slides} slides. If the text is short, expand on ideas. If long, condense appropriately.
-"""
-        else:
-            prompt = """
+# Static part of the pass-1 prompt; slide count, guidance and text follow it
+_INITIAL_CONTENT_INSTRUCTIONS = """
 You are an expert presentation designer. Convert the provided text into presentation slides.
 
-Generate a comprehensive presentation with:
-- A title slide with engaging title and descriptive subtitle
-- Multiple content slides covering all key points from the text
-- A conclusion slide with key takeaways
-"""
-        
-        prompt += """
-
 Focus on extracting important information from the text.
 
 IMPORTANT: Return ONLY a valid JSON array with this EXACT structure:
@@ -878,58 +1423,628 @@ DO NOT use markdown formatting.
 DO NOT add comments.
 Just the JSON array.
 """
+
+def _refinement_requirements(template_slide: Dict[str, Any]) -> str:
+    """
+    'Template requirements' block of the refinement prompt for one template slide
+    
+    Memoized on the slide dict as '_refine_reqs', since refinement passes
+    revisit the same template slides.
+    """
+    reqs = template_slide.get('_refine_reqs')
+    if reqs is not None:
+        return reqs
+    
+    parts = ["\nTemplate requirements:\n"]
+    for ph in template_slide.get('placeholders', []):
+        if 'TITLE' in ph.get('type', ''):
+            parts.append(f"- Title: max {ph.get('max_chars_per_line', 60)} chars\n")
+        elif 'SUBTITLE' in ph.get('type', ''):
+            parts.append(f"- Subtitle: max {ph.get('max_chars_per_line', 100)} chars\n")
+        elif 'CONTENT' in ph.get('type', '') or 'BODY' in ph.get('type', ''):
+            format_type = ph.get('text_format', 'bullet_list')
+            parts.append(f"- Content: {format_type}, max {ph.get('suggested_lines', 5)} items, ")
+            parts.append(f"{ph.get('max_chars_per_line', 80)} chars/line\n")
+            
+            if format_type == 'numbered_list':
+                parts.append("  FORMAT: Use numbered list (1. 2. 3.)\n")
+            elif format_type == 'paragraph':
+                parts.append("  FORMAT: Use paragraph text, not bullets\n")
+    
+    reqs = ''.join(parts)
+    template_slide['_refine_reqs'] = reqs
+    return reqs
+
+def _build_refinement_prompt(mapped_content: List[Dict[str, Any]],
+                             template_structure: Dict[str, Any],
+                             selected_indices: List[int]) -> str:
+    """Build prompt to refine content for specific template slides"""
+    parts = ["""You need to refine presentation content to perfectly fit template constraints.
+
+For each slide below, adjust the content to match the exact requirements:
+
+"""]
+    
+    for i, (content, idx) in enumerate(zip(mapped_content, selected_indices)):
+        template_slide = template_structure['existing_slides'][idx]
+        parts.append(f"\n[SLIDE {i+1}]\n")
+        parts.append(f"Current content:\n")
+        parts.append(f"- Title: {content.get('title', '')}\n")
+        parts.append(f"- Subtitle: {content.get('subtitle', '')}\n")
+        parts.append(f"- Content items: {len(content.get('content', []))}\n")
+        
+        parts.append(_refinement_requirements(template_slide))
+    
+    parts.append("""\n\nReturn a JSON array with refined content for each slide.
+Ensure all text fits within the constraints and follows the specified format.
+Return ONLY the JSON array.
+""")
+    return ''.join(parts)
+
+class GeminiProvider(BaseLLMProvider):
+    """Google Gemini API provider for text parsing and slide generation"""
+    
+    def __init__(self, api_key: str, model_name: str = 'gemini-2.5-pro'):
+        """Initialize Gemini provider with API key and model name"""
+        self.api_key = api_key
+        self.model_name = model_name or 'gemini-2.5-pro'
+        self.model = _shared_model(api_key, self.model_name)
+        self._mapper = ContentMapper()
+    
+    def _model_for(self, system_instruction: str):
+        """Model bound to a static system instruction, created once per instruction block"""
+        return _shared_model(self.api_key, self.model_name, system_instruction)
+    
+    def _resolve_model(self, prompt: str, system_instruction: str = None):
+        """
+        Pick the model for a call and the prompt/cache key to send with it
+        
+        Returns:
+            Tuple of (model, prompt, cache_prompt); when the SDK can't take a system
+            instruction it is prepended to the prompt instead
+        """
+        # Looked up per call: the shared model may have been evicted since __init__
+        self.model = _shared_model(self.api_key, self.model_name)
+        if not system_instruction:
+            return self.model, prompt, prompt
+        model = self._model_for(system_instruction)
+        if model is None:
+            prompt = system_instruction + prompt
+            return self.model, prompt, prompt
+        return model, prompt, f"{system_instruction}\0{prompt}"
+    
+    def _call_with_retries(self, call):
+        """Run a Gemini request under the per-key rate limit, retrying transient errors with backoff"""
+        for attempt in range(GEMINI_MAX_RETRIES):
+            delay = _rate_limit_delay(self.api_key)
+            if delay:
+                time.sleep(delay)
+            try:
+                return call()
+            except _TRANSIENT_ERRORS as e:
+                if attempt == GEMINI_MAX_RETRIES - 1:
+                    raise
+                delay = _backoff_delay(attempt)
+                logger.warning("Gemini request failed (%s), retry %d in %.1fs", e, attempt + 1, delay)
+                time.sleep(delay)
+    
+    async def _call_with_retries_async(self, call):
+        """Async counterpart of _call_with_retries; call returns a fresh awaitable per attempt"""
+        for attempt in range(GEMINI_MAX_RETRIES):
+            delay = _rate_limit_delay(self.api_key)
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                return await call()
+            except _TRANSIENT_ERRORS as e:
+                if attempt == GEMINI_MAX_RETRIES - 1:
+                    raise
+                delay = _backoff_delay(attempt)
+                logger.warning("Gemini request failed (%s), retry %d in %.1fs", e, attempt + 1, delay)
+                await asyncio.sleep(delay)
+    
+    def _stream_text(self, prompt: str, source_text: str = None, system_instruction: str = None,
+                     generation_config=None):
+        """
+        Yield response text chunks as Gemini streams them
+        
+        A cached response is yielded whole. If the stream fails before any text
+        is received, the request is retried without streaming (with backoff on
+        transient errors). The full response is cached once the stream has been
+        consumed.
+        """
+        model, prompt, cache_prompt = self._resolve_model(prompt, system_instruction)
+        temperature = getattr(generation_config, 'temperature', None)
+        
+        cached = self._cache_get(cache_prompt, source_text, temperature)
+        if cached is not None:
+            yield cached
+            return
+        
+        parts = []
+        try:
+            stream = self._call_with_retries(
+                lambda: model.generate_content(prompt, generation_config=generation_config, stream=True))
+            for chunk in stream:
+                parts.append(chunk.text)
+                yield chunk.text
+        except Exception as e:
+            if parts:
+                raise
+            logger.warning("Streaming request failed (%s), retrying without streaming", e)
+            parts.append(self._call_with_retries(
+                lambda: model.generate_content(prompt, generation_config=generation_config)).text)
+            yield parts[0]
+        
+        self._cache_put(cache_prompt, ''.join(parts), source_text, temperature)
+    
+    def _generate_text(self, prompt: str, source_text: str = None, system_instruction: str = None,
+                       generation_config=None) -> str:
+        """Run a streamed generation and return the full response text"""
+        return ''.join(self._stream_text(prompt, source_text, system_instruction, generation_config))
+    
+    async def _generate_text_async(self, prompt: str, source_text: str = None, system_instruction: str = None,
+                                   generation_config=None) -> str:
+        """Run a generation on the event loop, bounded by GEMINI_MAX_CONCURRENCY"""
+        model, prompt, cache_prompt = self._resolve_model(prompt, system_instruction)
+        temperature = getattr(generation_config, 'temperature', None)
+        
+        cached = self._cache_get(cache_prompt, source_text, temperature)
+        if cached is not None:
+            return cached
+        
+        _bind_async_client(model, self.api_key)
+        async with _get_async_semaphore():
+            response = await self._call_with_retries_async(
+                lambda: model.generate_content_async(prompt, generation_config=generation_config))
+        self._cache_put(cache_prompt, response.text, source_text, temperature)
+        return response.text
+    
+    def _map_initial_content(self, initial_slides: List[Dict[str, Any]],
+                             template_structure: Dict[str, Any]):
+        """Map pass-1 slides onto the best template slides"""
+        return self._mapper.map_content_to_template(initial_slides, template_structure)
+    
+    def _content_needs_refinement(self, mapped_content: List[Dict[str, Any]],
+                                  template_structure: Dict[str, Any],
+                                  selected_indices: List[int]) -> bool:
+        """
+        Check whether mapped content still breaks any template limit
+        
+        ContentMapper hard-truncates overlong text with '...' and caps nothing else
+        about item counts, so pass 2 is only worth a Gemini call when text was cut,
+        a title is missing, or a placeholder gets more lines than it holds.
+        """
+        for content, idx in zip(mapped_content, selected_indices):
+            template_slide = template_structure['existing_slides'][idx]
+            title = content.get('title') or ''
+            subtitle = content.get('subtitle') or ''
+            items = content.get('content') or []
+            
+            if template_slide.get('has_title') and not title:
+                return True
+            if title.endswith('...') or subtitle.endswith('...'):
+                return True
+            
+            for ph in template_slide.get('placeholders', []):
+                ph_type = ph.get('type', '')
+                if 'SUBTITLE' in ph_type:
+                    if len(subtitle) > ph.get('max_chars_per_line', 100):
+                        return True
+                elif 'TITLE' in ph_type:
+                    if len(title) > ph.get('max_chars_per_line', 60):
+                        return True
+                elif 'CONTENT' in ph_type or 'BODY' in ph_type:
+                    if len(items) > ph.get('suggested_lines', 5):
+                        return True
+                    max_chars = ph.get('max_chars_per_line', 80)
+                    if any(len(item) > max_chars or item.endswith('...') for item in items):
+                        return True
+        return False
+    
+    def _merge_refinements(self, mapped_content: List[Dict[str, Any]],
+                           final_slides: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Merge pass-2 refinements into the mapped content, keeping originals where refinement is empty"""
+        for i, slide in enumerate(final_slides[:len(mapped_content)]):
+            # Keep the original content if the refined version is empty
+            if slide.get('content') or mapped_content[i].get('content') is None:
+                mapped_content[i]['content'] = slide.get('content', mapped_content[i].get('content', []))
+            if slide.get('title'):
+                mapped_content[i]['title'] = slide.get('title')
+            if slide.get('subtitle'):
+                mapped_content[i]['subtitle'] = slide.get('subtitle')
+        
+        # Log the actual content being returned
+        if logger.isEnabledFor(logging.DEBUG):
+            for idx, content in enumerate(mapped_content):
+                logger.debug("Slide %d final content: title='%s', subtitle='%s', content=%s",
+                             idx + 1, content.get('title'), content.get('subtitle'),
+                             content.get('content', []))
+        
+        logger.info("Generated and refined %d slides", len(mapped_content))
+        return mapped_content
+    
+    def iter_slides(self, text_content: str, guidance: str = "", num_slides: int = None, progress_callback=None):
+        """
+        Generate slides in a single pass, yielding each one as soon as it has streamed in
+        
+        Args:
+            text_content: The input text to be converted
+            guidance: Optional guidance for tone/structure
+            num_slides: Target number of slides to generate
+            progress_callback: Optional callable(slide_index, slide) run per yielded slide
+            
+        Yields:
+            Validated slide dictionaries, in order
+        """
+        if text_content:
+            text_content = text_content[:MAX_TEXT_CHARS]
+        prompt = self._build_prompt_tail(text_content, guidance, num_slides)
+        chunks = []
+        
+        def collect():
+            for chunk in self._stream_text(prompt, text_content, system_instruction=_PLANNER_INSTRUCTIONS,
+                                          generation_config=_generation_config(num_slides)):
+                chunks.append(chunk)
+                yield chunk
+        
+        stream = collect()
+        count = 0
+        complete = True
+        for raw in _iter_json_objects(stream):
+            try:
+                slide = _loads(raw)
+            except json.JSONDecodeError:
+                # Leave malformed output to the full-response parser below
+                complete = False
+                break
+            if not isinstance(slide, dict):
+                continue
+            slide = _validate_slide(slide)
+            if progress_callback:
+                progress_callback(count, slide)
+            count += 1
+            yield slide
+        
+        for _ in stream:
+            pass
+        if count and complete:
+            return
+        
+        # Malformed output (e.g. trailing commas, single quotes): reparse it whole
+        # and yield whatever the incremental pass didn't get to
+        for slide in self._parse_response(''.join(chunks))[count:]:
+            if progress_callback:
+                progress_callback(count, slide)
+            count += 1
+            yield slide
+    
+    def parse_text_to_slides(self, text_content: str, guidance: str = "", template_structure: Dict[str, Any] = None, num_slides: int = None, progress_callback=None) -> List[Dict[str, Any]]:
+        """
+        Parse input text into structured slide content using Gemini with two-pass generation
+        
+        Args:
+            text_content: The input text to be converted
+            guidance: Optional guidance for tone/structure
+            template_structure: Optional template structure information
+            num_slides: Target number of slides to generate
+            progress_callback: Optional callable(slide_index, slide), single-pass only
+            
+        Returns:
+            List of slide dictionaries with structure and content
+        """
+        # Trim once here; every prompt builder below gets the trimmed text
+        if text_content:
+            text_content = text_content[:MAX_TEXT_CHARS]
+        try:
+            # First pass: Generate initial content
+            if template_structure and 'existing_slides' in template_structure:
+                # If we have a template, do intelligent two-pass generation
+                logger.info("Starting two-pass content generation with template awareness")
+                # Pass 1: Generate initial content WITH num_slides constraint
+                initial_prompt = self._build_initial_content_prompt(text_content, guidance, num_slides)
+                if num_slides:
+                    logger.info("Pass 1: Generating initial content (target: %d slides)", num_slides)
+                else:
+                    logger.info("Pass 1: Generating initial content")
+                initial_slides = self._parse_response(self._generate_text(
+                    initial_prompt, text_content, generation_config=_generation_config(num_slides)))
+                
+                # Map content to best template slides
+                mapped_content, selected_indices = self._map_initial_content(initial_slides, template_structure)
+                
+                # Pass 2: Refine content for selected slides
+                if mapped_content:
+                    if not self._content_needs_refinement(mapped_content, template_structure, selected_indices):
+                        logger.info("Pass 2 skipped: mapped content already fits the template")
+                        return mapped_content
+                    logger.info("Pass 2: Refining content for selected template slides")
+                    refined_prompt = self._build_refinement_prompt(
+                        mapped_content, template_structure, selected_indices
+                    )
+                    final_slides = self._parse_response(self._generate_text(
+                        refined_prompt, generation_config=_generation_config(len(mapped_content))))
+                    return self._merge_refinements(mapped_content, final_slides)
+                else:
+                    return initial_slides
+            else:
+                # Single pass for non-template generation
+                logger.info("Sending request to Gemini API")
+                slide_structure = list(self.iter_slides(text_content, guidance, num_slides, progress_callback))
+                logger.info("Generated %d slides", len(slide_structure))
+                return slide_structure
+            
+        except Exception as e:
+            logger.error("Error with Gemini API: %s", e)
+            raise Exception(f"Failed to process text with Gemini: {str(e)}")
+    
+    async def parse_text_to_slides_async(self, text_content: str, guidance: str = "", template_structure: Dict[str, Any] = None, num_slides: int = None) -> List[Dict[str, Any]]:
+        """
+        Async counterpart of parse_text_to_slides using generate_content_async
+        
+        Lets async callers overlap several presentations on one event loop; each
+        request holds a slot of the per-loop concurrency semaphore while in flight.
+        
+        Args:
+            text_content: The input text to be converted
+            guidance: Optional guidance for tone/structure
+            template_structure: Optional template structure information
+            num_slides: Target number of slides to generate
+            
+        Returns:
+            List of slide dictionaries with structure and content
+        """
+        if text_content:
+            text_content = text_content[:MAX_TEXT_CHARS]
+        try:
+            if template_structure and 'existing_slides' in template_structure:
+                initial_prompt = self._build_initial_content_prompt(text_content, guidance, num_slides)
+                initial_slides = self._parse_response(await self._generate_text_async(
+                    initial_prompt, text_content, generation_config=_generation_config(num_slides)))
+                
+                mapped_content, selected_indices = self._map_initial_content(initial_slides, template_structure)
+                if not mapped_content:
+                    return initial_slides
+                if not self._content_needs_refinement(mapped_content, template_structure, selected_indices):
+                    logger.info("Pass 2 skipped: mapped content already fits the template")
+                    return mapped_content
+                
+                refined_prompt = self._build_refinement_prompt(
+                    mapped_content, template_structure, selected_indices
+                )
+                final_slides = self._parse_response(await self._generate_text_async(
+                    refined_prompt, generation_config=_generation_config(len(mapped_content))))
+                return self._merge_refinements(mapped_content, final_slides)
+            
+            prompt = self._build_prompt_tail(text_content, guidance, num_slides)
+            slide_structure = self._parse_response(
+                await self._generate_text_async(prompt, text_content, system_instruction=_PLANNER_INSTRUCTIONS,
+                                                generation_config=_generation_config(num_slides)))
+            logger.info("Generated %d slides", len(slide_structure))
+            return slide_structure
+        
+        except Exception as e:
+            logger.error("Error with Gemini API: %s", e)
+            raise Exception(f"Failed to process text with Gemini: {str(e)}")
+    
+    async def parse_many_async(self, jobs: List[Dict[str, Any]]) -> List[Any]:
+        """
+        Generate several presentations concurrently
+        
+        Args:
+            jobs: Keyword-argument dicts for parse_text_to_slides_async
+            
+        Returns:
+            One result per job, in order; failed jobs yield their exception
+        """
+        return await asyncio.gather(
+            *(self.parse_text_to_slides_async(**job) for job in jobs),
+            return_exceptions=True
+        )
+    
+    def _run_batch(self, prompts: Dict[str, tuple]) -> Dict[str, str]:
+        """
+        Run prompts as a single Gemini Batch API job and wait for it to finish
+        
+        Args:
+            prompts: Request key -> (prompt, expected slide count)
+            
+        Returns:
+            Request key -> response text; failed requests are logged and left out
+        """
+        client = genai_sdk.Client(api_key=self.api_key)
+        
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False, encoding='utf-8') as f:
+            for key, (prompt, slide_count) in prompts.items():
+                f.write(json.dumps({'key': key, 'request': {
+                    'contents': [{'role': 'user', 'parts': [{'text': prompt}]}],
+                    'generation_config': {
+                        'temperature': 0.2,
+                        'top_p': 0.9,
+                        'max_output_tokens': _max_output_tokens(slide_count),
+                        'response_mime_type': 'application/json',
+                    },
+                }}) + '\n')
+            requests_path = f.name
+        try:
+            uploaded = client.files.upload(file=requests_path, config={'mime_type': 'jsonl'})
+        finally:
+            os.remove(requests_path)
+        
+        job = client.batches.create(model=self.model_name, src=uploaded.name)
+        logger.info("Submitted Gemini batch job %s with %d requests", job.name, len(prompts))
+        while job.state.name not in _BATCH_DONE_STATES:
+            time.sleep(GEMINI_BATCH_POLL_INTERVAL)
+            job = client.batches.get(name=job.name)
+        if job.state.name != 'JOB_STATE_SUCCEEDED':
+            raise Exception(f"Gemini batch job {job.name} ended in state {job.state.name}")
+        
+        results = {}
+        for line in client.files.download(file=job.dest.file_name).decode('utf-8').splitlines():
+            if not line.strip():
+                continue
+            entry = _loads(line)
+            response = entry.get('response')
+            if not response:
+                logger.error("Batch request %s failed: %s", entry.get('key'), entry.get('error'))
+                continue
+            parts = response['candidates'][0]['content']['parts']
+            results[entry['key']] = ''.join(part.get('text', '') for part in parts)
+        return results
+    
+    def parse_text_to_slides_batch(self, jobs: List[Dict[str, Any]]) -> List[Any]:
+        """
+        Generate many presentations through the Gemini Batch API
+        
+        Meant for offline/bulk work: results arrive when the batch completes rather
+        than per request. Template jobs take two batch rounds (initial content, then
+        refinement). Without the google-genai package the jobs run concurrently on
+        the live endpoint instead.
+        
+        Args:
+            jobs: Keyword-argument dicts for parse_text_to_slides
+            
+        Returns:
+            One result per job, in order; failed jobs yield their exception
+        """
+        if genai_sdk is None:
+            logger.warning("google-genai is not installed; running batch jobs on the live API")
+            return asyncio.run(self.parse_many_async(jobs))
+        
+        def response_for(responses, key):
+            if key not in responses:
+                raise Exception("Gemini batch returned no response for this job")
+            return responses[key]
+        
+        results = [None] * len(jobs)
+        first_pass = {}
+        for i, job in enumerate(jobs):
+            template_structure = job.get('template_structure')
+            text_content = (job['text_content'] or '')[:MAX_TEXT_CHARS]
+            if template_structure and 'existing_slides' in template_structure:
+                prompt = self._build_initial_content_prompt(text_content, job.get('guidance', ''), job.get('num_slides'))
+            else:
+                prompt = self._build_prompt(text_content, job.get('guidance', ''), None, job.get('num_slides'))
+            first_pass[str(i)] = (prompt, job.get('num_slides'))
+        responses = self._run_batch(first_pass)
+        
+        mapped = {}
+        second_pass = {}
+        for i, job in enumerate(jobs):
+            try:
+                slides = self._parse_response(response_for(responses, str(i)))
+                template_structure = job.get('template_structure')
+                if template_structure and 'existing_slides' in template_structure:
+                    mapped_content, selected_indices = self._map_initial_content(slides, template_structure)
+                    if mapped_content and not self._content_needs_refinement(
+                            mapped_content, template_structure, selected_indices):
+                        slides = mapped_content
+                    elif mapped_content:
+                        mapped[i] = mapped_content
+                        second_pass[str(i)] = (self._build_refinement_prompt(
+                            mapped_content, template_structure, selected_indices), len(mapped_content))
+                results[i] = slides
+            except Exception as e:
+                results[i] = e
+        
+        if second_pass:
+            responses = self._run_batch(second_pass)
+            for key in second_pass:
+                i = int(key)
+                try:
+                    results[i] = self._merge_refinements(mapped[i], self._parse_response(response_for(responses, key)))
+                except Exception as e:
+                    results[i] = e
+        
+        return results
+    
+    def _build_prompt(self, text_content: str, guidance: str, template_structure: Dict[str, Any] = None, num_slides: int = None) -> str:
+        """Build the prompt for Gemini API"""
+        
+        # If template structure is provided, use template-aware prompt
+        if template_structure and 'existing_slides' in template_structure:
+            return self._build_template_aware_prompt(text_content, guidance, template_structure, num_slides)
+        
+        return ''.join((_PLANNER_INSTRUCTIONS, self._build_prompt_tail(text_content, guidance, num_slides)))
+    
+    def _build_prompt_tail(self, text_content: str, guidance: str, num_slides: int = None) -> str:
+        """Request-specific part of the single-pass prompt (follows _PLANNER_INSTRUCTIONS)"""
+        parts = []
+
         if guidance:
-            prompt += f"\nGUIDANCE: {guidance}\n"
+            parts.append(f"\n\nADDITIONAL GUIDANCE: {guidance}\n")
+            parts.append("Apply this guidance to the tone, structure, and focus of the presentation.\n")
         
         if num_slides:
-            prompt += f"\nREMEMBER: You MUST generate EXACTLY {num_slides} slides total.\n"
+            parts.append(f"\n\nREQUIRED NUMBER OF SLIDES: {num_slides} (expand or condense as needed, but output exactly {num_slides} slides)\n")
+        
+        parts.append(f"\n\nTEXT TO CONVERT:\n{text_content}\n\n")
+        parts.append(_TAIL)
         
-        prompt += f"\nTEXT TO CONVERT:\n{text_content}\n\n"
-        prompt += "Return ONLY the JSON array."
-        return prompt
+        return ''.join(parts)
+    
+    def _build_initial_content_prompt(self, text_content: str, guidance: str, num_slides: int = None) -> str:
+        """Build prompt for initial content generation with optional slide count constraint"""
+        
+        # Static rules first so every request shares the same prefix
+        parts = [_INITIAL_CONTENT_INSTRUCTIONS]
+        
+        if num_slides:
+            parts.append(f"""
+SLIDE COUNT: Generate EXACTLY {num_slides} slides total, including:
+- 1 title slide (with engaging title and descriptive subtitle)
+- {num_slides - 2} content slides (covering key points from the text)
+- 1 conclusion slide (with key takeaways)
+
+Adjust the content distribution to fit exactly {num_slides} slides. If the text is short, expand on ideas. If long, condense appropriately.
+""")
+        else:
+            parts.append("""
+Generate a comprehensive presentation with:
+- A title slide with engaging title and descriptive subtitle
+- Multiple content slides covering all key points from the text
+- A conclusion slide with key takeaways
+""")
+        
+        if guidance:
+            parts.append(f"\nGUIDANCE: {guidance}\n")
+        
+        if num_slides:
+            parts.append(f"\nREMEMBER: You MUST generate EXACTLY {num_slides} slides total.\n")
+        
+        parts.append(f"\nTEXT TO CONVERT:\n{text_content}\n\n")
+        parts.append("Return ONLY the JSON array.")
+        return ''.join(parts)
     
     def _build_refinement_prompt(self, mapped_content: List[Dict[str, Any]], 
                                 template_structure: Dict[str, Any],
                                 selected_indices: List[int]) -> str:
         """Build prompt to refine content for specific template slides"""
-        prompt = """You need to refine presentation content to perfectly fit template constraints.
-
-For each slide below, adjust the content to match the exact requirements:
-
-"""
-        
-        for i, (content, idx) in enumerate(zip(mapped_content, selected_indices)):
-            template_slide = template_structure['existing_slides'][idx]
-            prompt += f"\n[SLIDE {i+1}]\n"
-            prompt += f"Current content:\n"
-            prompt += f"- Title: {content.get('title', '')}\n"
-            prompt += f"- Subtitle: {content.get('subtitle', '')}\n"
-            prompt += f"- Content items: {len(content.get('content', []))}\n"
-            
-            prompt += f"\nTemplate requirements:\n"
-            for ph in template_slide.get('placeholders', []):
-                if 'TITLE' in ph.get('type', ''):
-                    prompt += f"- Title: max {ph.get('max_chars_per_line', 60)} chars\n"
-                elif 'SUBTITLE' in ph.get('type', ''):
-                    prompt += f"- Subtitle: max {ph.get('max_chars_per_line', 100)} chars\n"
-                elif 'CONTENT' in ph.get('type', '') or 'BODY' in ph.get('type', ''):
-                    format_type = ph.get('text_format', 'bullet_list')
-                    prompt += f"- Content: {format_type}, max {ph.get('suggested_lines', 5)} items, "
-                    prompt += f"{ph.get('max_chars_per_line', 80)} chars/line\n"
-                    
-                    if format_type == 'numbered_list':
-                        prompt += "  FORMAT: Use numbered list (1. 2. 3.)\n"
-                    elif format_type == 'paragraph':
-                        prompt += "  FORMAT: Use paragraph text, not bullets\n"
-        
-        prompt += """\n\nReturn a JSON array with refined content for each slide.
-Ensure all text fits within the constraints and follows the specified format.
-Return ONLY the JSON array.
-"""
-        return prompt
+        return _build_refinement_prompt(mapped_content, template_structure, selected_indices)
     
     def _parse_response(self, response_text: str) -> List[Dict[str, Any]]:
         """Parse and validate Gemini's JSON response with better error handling"""
+        # Schema-constrained output is plain JSON; only free-form text needs the repairs below
+        try:
+            slide_data = _loads(response_text)
+        except (json.JSONDecodeError, TypeError):
+            slide_data = None
+        if isinstance(slide_data, list) and slide_data and all(isinstance(slide, dict) for slide in slide_data):
+            return _validate_in_place(slide_data, _validate_slide)
+        
+        # Free-form output: decode the first balanced [...] span (skips fences and prose)
+        candidate = _extract_json_array(response_text)
+        if candidate is not None:
+            try:
+                slide_data = _loads(candidate)
+            except json.JSONDecodeError:
+                slide_data = None
+            if isinstance(slide_data, list) and slide_data and all(isinstance(slide, dict) for slide in slide_data):
+                validated_slides = _validate_in_place(slide_data, _validate_slide)
+                logger.info("Successfully parsed %d slides", len(validated_slides))
+                return validated_slides
+        
+        # Only malformed JSON gets here: repair it and try again
         try:
             # Store original for debugging
             original_response = response_text
@@ -938,25 +2053,14 @@ Return ONLY the JSON array.
             response_text = response_text.strip()
             
             # Remove markdown code blocks if present
-            if '```json' in response_text:
-                start = response_text.find('```json') + 7
-                end = response_text.find('```', start)
-                if end > start:
-                    response_text = response_text[start:end]
-            elif '```' in response_text:
-                start = response_text.find('```') + 3
-                end = response_text.find('```', start)
-                if end > start:
-                    response_text = response_text[start:end]
+            fence = _FENCE_RE.search(response_text)
+            if fence:
+                response_text = fence.group(1)
             
             response_text = response_text.strip()
             
-            # Remove any trailing commas that might cause JSON errors
-            import re
-            # Fix trailing commas in arrays
-            response_text = re.sub(r',\s*]', ']', response_text)
-            # Fix trailing commas in objects
-            response_text = re.sub(r',\s*}', '}', response_text)
+            # Remove any trailing commas (in arrays and objects) that might cause JSON errors
+            response_text = _TRAILING_COMMA.sub(r'\1', response_text)
             
             # Fix common JSON formatting issues
             # Replace single quotes with double quotes if needed
@@ -977,7 +2081,7 @@ Return ONLY the JSON array.
                     response_text = response_text[:array_end + 1]
             
             # Parse JSON
-            slide_data = json.loads(response_text)
+            slide_data = _loads(response_text)
             
             # Validate structure
             if not isinstance(slide_data, list):
@@ -986,102 +2090,29 @@ Return ONLY the JSON array.
             if len(slide_data) == 0:
                 raise ValueError("Response contains no slides")
             
-            validated_slides = []
-            for slide in slide_data:
-                validated_slide = self._validate_slide(slide)
-                validated_slides.append(validated_slide)
+            validated_slides = [_validate_slide(slide) for slide in slide_data]
             
-            logger.info(f"Successfully parsed {len(validated_slides)} slides")
+            logger.info("Successfully parsed %d slides", len(validated_slides))
             return validated_slides
             
         except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON response: {e}")
-            logger.error(f"Problematic response text (first 500 chars): {response_text[:500]}")
-            
-            # Try one more time with aggressive cleaning
-            try:
-                # Extract JSON array more aggressively
-                import re
-                json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
-                if json_match:
-                    cleaned_json = json_match.group(0)
-                    slide_data = json.loads(cleaned_json)
-                    validated_slides = []
-                    for slide in slide_data:
-                        validated_slide = self._validate_slide(slide)
-                        validated_slides.append(validated_slide)
-                    logger.info(f"Successfully parsed {len(validated_slides)} slides after aggressive cleaning")
-                    return validated_slides
-            except:
-                pass
+            logger.error("Failed to parse JSON response: %s", e)
+            if logger.isEnabledFor(logging.ERROR):
+                logger.error("Problematic response text (first 500 chars): %s", response_text[:500])
             
             # Last resort: fallback
             logger.warning("Using fallback slide generation")
             return self._create_fallback_slides(response_text)
         except Exception as e:
-            logger.error(f"Error parsing response: {e}")
+            logger.error("Error parsing response: %s", e)
             raise Exception(f"Failed to parse Gemini response: {str(e)}")
     
-    def _validate_slide(self, slide: Dict[str, Any]) -> Dict[str, Any]:
-        """Validate and clean individual slide data"""
-        validated = {
-            "slide_type": slide.get("slide_type", "content"),
-            "title": str(slide.get("title", ""))[:100],  # Limit title length
-            "subtitle": str(slide.get("subtitle", ""))[:150],  # Limit subtitle length
-            "content": []
-        }
-        
-        # Validate slide type
-        if validated["slide_type"] not in ["title", "content", "conclusion"]:
-            validated["slide_type"] = "content"
-        
-        # IMPORTANT: Title slides should NOT have content - only title and subtitle
-        if validated["slide_type"] == "title":
-            # For title slides, ensure content is empty
-            validated["content"] = []
-            return validated
-        
-        # Process content for non-title slides - Check if there are separator markers
-        content = slide.get("content", [])
-        has_separators = False
-        if isinstance(content, list):
-            # Check for separator markers
-            separator_markers = ["[NEXT_PLACEHOLDER]", "[PLACEHOLDER]", "---", "###", "[TEXT_AREA]"]
-            for item in content:
-                if any(sep in str(item).upper() for sep in separator_markers):
-                    has_separators = True
-                    break
-            
-            # If has separators, don't limit content (for multi-placeholder support)
-            if has_separators:
-                for item in content:  # Keep all items for multi-placeholder
-                    if isinstance(item, str):
-                        validated["content"].append(str(item).strip()[:200])  # Still limit individual item length
-            else:
-                # Regular validation with limits
-                for item in content[:6]:  # Limit to 6 bullet points for single placeholder
-                    if isinstance(item, str) and item.strip():
-                        validated["content"].append(str(item).strip()[:200])  # Limit bullet length
-        
-        return validated
-    
     def _create_fallback_slides(self, text: str) -> List[Dict[str, Any]]:
         """Create basic slides when JSON parsing fails"""
         logger.warning("Creating fallback slides due to parsing error")
         
-        # Split text into chunks
-        sentences = text.split('. ')
-        chunks = []
-        current_chunk = []
-        
-        for sentence in sentences:
-            current_chunk.append(sentence)
-            if len(current_chunk) >= 3:  # 3 sentences per slide
-                chunks.append('. '.join(current_chunk))
-                current_chunk = []
-        
-        if current_chunk:
-            chunks.append('. '.join(current_chunk))
+        # Split text into chunks of 3 sentences per slide (max 10 content slides)
+        chunks = _sentence_chunks(text)
         
         slides = []
         
@@ -1151,10 +2182,15 @@ class AIPipeProvider(BaseLLMProvider):
             List of slide dictionaries with structure and content
         """
         try:
-            import requests
+            # Build the messages (static instructions first, for prompt caching)
+            messages = self._build_messages(text_content, guidance, template_structure, num_slides=num_slides)
+            cache_prompt = _messages_text(messages)
             
-            # Build the prompt
-            prompt = self._build_prompt(text_content, guidance, template_structure, num_slides=num_slides)
+            response_text = self._cache_get(cache_prompt, text_content, AIPIPE_TEMPERATURE)
+            if response_text is not None:
+                slide_structure = self._parse_response(response_text)
+                logger.info(f"Generated {len(slide_structure)} slides from cached AI Pipe response ({self.model_name})")
+                return slide_structure
             
             # Generate content with AI Pipe
             logger.info(f"Sending request to AI Pipe API ({self.model_name})")
@@ -1166,24 +2202,22 @@ class AIPipeProvider(BaseLLMProvider):
             
             payload = {
                 "model": self.model_name,
-                "messages": [
-                    {"role": "system", "content": "You are an expert presentation designer. Always respond with valid JSON only."},
-                    {"role": "user", "content": prompt}
-                ],
-                "max_tokens": 4000,
-                "temperature": 0.3
+                "messages": messages,
+                "max_tokens": _aipipe_max_tokens(num_slides),
+                "temperature": AIPIPE_TEMPERATURE
             }
             
-            response = requests.post(
-                "https://aipipe.org/openrouter/v1/chat/completions",
+            response = _get_http_session().post(
+                AIPIPE_CHAT_URL,
                 headers=headers,
-                json=payload,
+                data=_dumps(payload),
                 timeout=60
             )
             response.raise_for_status()
             
             result = response.json()
             response_text = result['choices'][0]['message']['content']
+            self._cache_put(cache_prompt, response_text, text_content, AIPIPE_TEMPERATURE)
             
             # Parse the response
             slide_structure = self._parse_response(response_text)
@@ -1205,39 +2239,58 @@ class AIPipeProvider(BaseLLMProvider):
         Returns:
             List of refined slide dicts
         """
-        import requests
         try:
-            # Build a refinement prompt (reuse Gemini logic for now)
-            from .llm_providers import GeminiProvider
-            gemini = GeminiProvider(self.api_key)
-            prompt = gemini._build_refinement_prompt(mapped_content, template_structure, selected_indices)
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            payload = {
-                "model": self.model_name,
-                "messages": [
-                    {"role": "system", "content": "You are an expert presentation designer. Always respond with valid JSON only."},
-                    {"role": "user", "content": prompt}
-                ],
-                "max_tokens": 4000,
-                "temperature": 0.3
-            }
-            response = requests.post(
-                "https://aipipe.org/openrouter/v1/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=60
-            )
-            response.raise_for_status()
-            result = response.json()
-            response_text = result['choices'][0]['message']['content']
-            refined_slides = self._parse_response(response_text)
+            if len(mapped_content) <= AIPIPE_SINGLE_REFINE_MAX:
+                prompt = _build_refinement_prompt(mapped_content, template_structure, selected_indices)
+                return self._request_refinement(prompt, len(mapped_content))
+            
+            # One short request per slide, sent concurrently over the pooled session;
+            # a slide whose call fails keeps its mapped content
+            refined_slides = list(mapped_content)
+            with ThreadPoolExecutor(max_workers=AIPIPE_MAX_CONCURRENCY) as executor:
+                future_to_index = {
+                    executor.submit(self._request_refinement,
+                                    _build_refinement_prompt([content], template_structure, [idx]), 1): i
+                    for i, (content, idx) in enumerate(zip(mapped_content, selected_indices))
+                }
+                for future in as_completed(future_to_index):
+                    index = future_to_index[future]
+                    try:
+                        refined = future.result()
+                        if refined:
+                            refined_slides[index] = refined[0]
+                    except Exception as e:
+                        logger.error(f"AI Pipe refinement of slide {index + 1} failed: {str(e)}")
             return refined_slides
         except Exception as e:
             logger.error(f"AI Pipe refinement failed: {str(e)}")
             return mapped_content
+    
+    def _request_refinement(self, prompt: str, slide_count: int) -> List[Dict[str, Any]]:
+        """Send one refinement prompt to AI Pipe and parse the returned slides"""
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        payload = {
+            "model": self.model_name,
+            "messages": [
+                {"role": "system", "content": "You are an expert presentation designer. Always respond with valid JSON only."},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": _aipipe_max_tokens(slide_count),
+            "temperature": 0.3
+        }
+        response = _get_http_session().post(
+            AIPIPE_CHAT_URL,
+            headers=headers,
+            data=_dumps(payload),
+            timeout=60
+        )
+        response.raise_for_status()
+        result = response.json()
+        response_text = result['choices'][0]['message']['content']
+        return self._parse_response(response_text)
 
     @classmethod
     def get_available_models(cls) -> List[str]:
@@ -1261,12 +2314,47 @@ class OpenAIProvider(BaseLLMProvider):
             raise ImportError("OpenAI library not installed. Install it with: pip install openai")
         
         super().__init__(api_key, model_name)
-        self.client = openai.OpenAI(api_key=api_key)
+        self.client = _shared_openai_client(api_key)
         
         # Validate model
         if model_name not in self.AVAILABLE_MODELS:
             logger.warning(f"Model {model_name} not in known models list. Proceeding anyway.")
     
+    @property
+    def aclient(self):
+        """Shared AsyncOpenAI client for this key on the running event loop, created on first async use"""
+        return _shared_async_openai_client(self.api_key)
+    
+    def _completion_kwargs(self, messages: List[Dict[str, Any]], slide_count: int = None,
+                           refine: bool = False) -> Dict[str, Any]:
+        """Arguments for chat.completions.create, in JSON mode where the model supports it"""
+        max_tokens = _openai_max_tokens(slide_count)
+        kwargs = {
+            "model": self.model_name,
+            "max_tokens": max_tokens,
+            "temperature": OPENAI_TEMPERATURE,
+            "timeout": OPENAI_REQUEST_TIMEOUT if refine else _openai_generation_timeout(max_tokens),
+        }
+        # Other models (and unknown system prompts) keep the prompt-only JSON instructions
+        json_system = (_JSON_MODE_SYSTEM_MESSAGES.get(messages[0]["content"])
+                       if self.model_name in _OPENAI_JSON_MODE_MODELS else None)
+        if json_system is not None:
+            messages = [{"role": "system", "content": json_system}, *messages[1:]]
+            kwargs["response_format"] = {"type": "json_object"}
+        kwargs["messages"] = messages
+        return kwargs
+    
+    def _parse_completion(self, response_text: str) -> List[Dict[str, Any]]:
+        """Parse a completion: a JSON-mode {"slides": [...]} object, else any array response"""
+        try:
+            data = _loads(response_text)
+        except (json.JSONDecodeError, TypeError):
+            data = None
+        slides = data.get("slides") if isinstance(data, dict) else None
+        if isinstance(slides, list) and slides and all(isinstance(slide, dict) for slide in slides):
+            return _validate_in_place(slides, self._validate_slide)
+        return self._parse_response(response_text)
+    
     def parse_text_to_slides(self, text_content: str, guidance: str = "", template_structure: Dict[str, Any] = None, num_slides: int = None) -> List[Dict[str, Any]]:
         """
         Parse input text into structured slide content using OpenAI
@@ -1280,26 +2368,22 @@ class OpenAIProvider(BaseLLMProvider):
             List of slide dictionaries with structure and content
         """
         try:
-            # Build the prompt
-            prompt = self._build_prompt(text_content, guidance, template_structure, num_slides=num_slides)
+            # Build the messages (static instructions first, for prompt caching)
+            messages = self._build_messages(text_content, guidance, template_structure, num_slides=num_slides)
+            cache_prompt = _messages_text(messages)
             
-            # Generate content with OpenAI
-            logger.info(f"Sending request to OpenAI API ({self.model_name})")
-            
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "system", "content": "You are an expert presentation designer. Always respond with valid JSON only."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=4000,
-                temperature=0.3  # Lower temperature for more consistent formatting
-            )
-            
-            response_text = response.choices[0].message.content
+            response_text = self._cache_get(cache_prompt, text_content, OPENAI_TEMPERATURE)
+            if response_text is None:
+                # Generate content with OpenAI
+                logger.info(f"Sending request to OpenAI API ({self.model_name})")
+                
+                response = self.client.chat.completions.create(**self._completion_kwargs(messages, num_slides))
+                
+                response_text = response.choices[0].message.content
+                self._cache_put(cache_prompt, response_text, text_content, OPENAI_TEMPERATURE)
             
             # Parse the response
-            slide_structure = self._parse_response(response_text)
+            slide_structure = self._parse_completion(response_text)
             
             logger.info(f"Generated {len(slide_structure)} slides using {self.model_name}")
             return slide_structure
@@ -1319,25 +2403,212 @@ class OpenAIProvider(BaseLLMProvider):
             List of refined slide dicts
         """
         try:
-            from .llm_providers import GeminiProvider
-            gemini = GeminiProvider(self.api_key)
-            prompt = gemini._build_refinement_prompt(mapped_content, template_structure, selected_indices)
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "system", "content": "You are an expert presentation designer. Always respond with valid JSON only."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=4000,
-                temperature=0.3
-            )
+            prompt = _build_refinement_prompt(mapped_content, template_structure, selected_indices)
+            response = self.client.chat.completions.create(**self._completion_kwargs([
+                {"role": "system", "content": _DEFAULT_SYSTEM_MESSAGE},
+                {"role": "user", "content": prompt}
+            ], len(mapped_content), refine=True))
             response_text = response.choices[0].message.content
-            refined_slides = self._parse_response(response_text)
+            refined_slides = self._parse_completion(response_text)
             return refined_slides
         except Exception as e:
             logger.error(f"OpenAI refinement failed: {str(e)}")
             return mapped_content
 
+    async def _complete_async(self, messages: List[Dict[str, Any]], slide_count: int = None,
+                              refine: bool = False) -> str:
+        """One chat completion on the event loop, bounded by OPENAI_MAX_CONCURRENCY"""
+        async with _get_async_semaphore(_openai_semaphores, OPENAI_MAX_CONCURRENCY):
+            response = await self.aclient.chat.completions.create(
+                **self._completion_kwargs(messages, slide_count, refine=refine))
+        return response.choices[0].message.content
+    
+    async def parse_text_to_slides_async(self, text_content: str, guidance: str = "", template_structure: Dict[str, Any] = None, num_slides: int = None) -> List[Dict[str, Any]]:
+        """
+        Async counterpart of parse_text_to_slides using AsyncOpenAI
+        
+        Args:
+            text_content: The input text to be converted
+            guidance: Optional guidance for tone/structure
+            template_structure: Optional template structure information
+            num_slides: Target number of slides to generate
+            
+        Returns:
+            List of slide dictionaries with structure and content
+        """
+        try:
+            messages = self._build_messages(text_content, guidance, template_structure, num_slides=num_slides)
+            cache_prompt = _messages_text(messages)
+            response_text = self._cache_get(cache_prompt, text_content, OPENAI_TEMPERATURE)
+            if response_text is None:
+                response_text = await self._complete_async(messages, num_slides)
+                self._cache_put(cache_prompt, response_text, text_content, OPENAI_TEMPERATURE)
+            slide_structure = self._parse_completion(response_text)
+            logger.info("Generated %d slides using %s", len(slide_structure), self.model_name)
+            return slide_structure
+        except Exception as e:
+            logger.error("Error with OpenAI API: %s", e)
+            raise Exception(f"Failed to process text with OpenAI ({self.model_name}): {str(e)}")
+    
+    async def parse_many_async(self, jobs: List[Dict[str, Any]]) -> List[Any]:
+        """
+        Generate several presentations concurrently
+        
+        Args:
+            jobs: Keyword-argument dicts for parse_text_to_slides_async
+            
+        Returns:
+            One result per job, in order; failed jobs yield their exception
+        """
+        return await asyncio.gather(
+            *(self.parse_text_to_slides_async(**job) for job in jobs),
+            return_exceptions=True
+        )
+    
+    async def refine_content_async(self, mapped_content, template_structure, selected_indices):
+        """
+        Refine each selected slide with its own concurrent request
+        
+        Args:
+            mapped_content: List of slide dicts to refine
+            template_structure: Template structure info
+            selected_indices: Indices of selected slides
+        Returns:
+            List of refined slide dicts, in input order; a slide whose request
+            fails keeps its mapped content
+        """
+        async def refine_one(content, idx):
+            prompt = _build_refinement_prompt([content], template_structure, [idx])
+            refined = self._parse_completion(await self._complete_async([
+                {"role": "system", "content": _DEFAULT_SYSTEM_MESSAGE},
+                {"role": "user", "content": prompt}
+            ], 1, refine=True))
+            return refined[0] if refined else content
+        
+        results = await asyncio.gather(
+            *(refine_one(content, idx) for content, idx in zip(mapped_content, selected_indices)),
+            return_exceptions=True
+        )
+        refined_slides = []
+        for i, (content, result) in enumerate(zip(mapped_content, results)):
+            if isinstance(result, Exception):
+                logger.error("OpenAI refinement of slide %d failed: %s", i + 1, result)
+                result = content
+            refined_slides.append(result)
+        return refined_slides
+
+    def _run_batch(self, prompts: Dict[str, str]) -> Dict[str, str]:
+        """
+        Run refinement prompts as a single OpenAI Batch API job and wait for it to finish
+        
+        Args:
+            prompts: custom_id -> user prompt
+            
+        Returns:
+            custom_id -> response text; failed requests are logged and left out
+        """
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False, encoding='utf-8') as f:
+            for custom_id, prompt in prompts.items():
+                body = self._completion_kwargs([
+                    {'role': 'system', 'content': _DEFAULT_SYSTEM_MESSAGE},
+                    {'role': 'user', 'content': prompt}
+                ], 1, refine=True)
+                del body['timeout']  # client-side only; batch requests run server-side
+                f.write(json.dumps({
+                    'custom_id': custom_id,
+                    'method': 'POST',
+                    'url': '/v1/chat/completions',
+                    'body': body,
+                }) + '\n')
+            requests_path = f.name
+        try:
+            with open(requests_path, 'rb') as requests_file:
+                uploaded = self.client.files.create(file=requests_file, purpose='batch')
+        finally:
+            os.remove(requests_path)
+        
+        batch = self.client.batches.create(input_file_id=uploaded.id, endpoint='/v1/chat/completions',
+                                           completion_window='24h')
+        logger.info("Submitted OpenAI batch %s with %d requests", batch.id, len(prompts))
+        while batch.status not in _OPENAI_BATCH_DONE_STATES:
+            time.sleep(OPENAI_BATCH_POLL_INTERVAL)
+            batch = self.client.batches.retrieve(batch.id)
+        if batch.status != 'completed':
+            raise Exception(f"OpenAI batch {batch.id} ended in state {batch.status}")
+        if not batch.output_file_id:
+            return {}
+        
+        results = {}
+        for line in self.client.files.content(batch.output_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            entry = _loads(line)
+            response = entry.get('response') or {}
+            if response.get('status_code') != 200:
+                logger.error("Batch request %s failed: %s", entry.get('custom_id'), entry.get('error') or response.get('body'))
+                continue
+            results[entry['custom_id']] = response['body']['choices'][0]['message']['content']
+        return results
+    
+    def refine_content_batch(self, decks: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Refine the slides of many decks through the OpenAI Batch API
+        
+        Every slide is its own batch request. Slides whose request failed or
+        came back unusable are retried once on the live API (refine_content_async);
+        if that fails too they keep their mapped content.
+        
+        Args:
+            decks: Keyword-argument dicts for refine_content
+            
+        Returns:
+            One list of refined slide dicts per deck, in order
+        """
+        prompts = {}
+        for d, deck in enumerate(decks):
+            for s, (content, idx) in enumerate(zip(deck['mapped_content'], deck['selected_indices'])):
+                prompts[f"{d}-{s}"] = _build_refinement_prompt([content], deck['template_structure'], [idx])
+        responses = self._run_batch(prompts) if prompts else {}
+        
+        results = []
+        failed = {}  # deck index -> positions of slides to retry
+        for d, deck in enumerate(decks):
+            refined_slides = list(deck['mapped_content'])
+            for s in range(min(len(deck['mapped_content']), len(deck['selected_indices']))):
+                refined = None
+                response_text = responses.get(f"{d}-{s}")
+                if response_text is not None:
+                    try:
+                        refined = self._parse_completion(response_text)
+                    except Exception as e:
+                        logger.error("Could not parse batch refinement %d-%d: %s", d, s, e)
+                if refined:
+                    refined_slides[s] = refined[0]
+                else:
+                    failed.setdefault(d, []).append(s)
+            results.append(refined_slides)
+        
+        if failed:
+            logger.warning("Retrying %d failed batch refinements on the live API", sum(map(len, failed.values())))
+            
+            async def retry_failed():
+                try:
+                    return await asyncio.gather(*(
+                        self.refine_content_async([decks[d]['mapped_content'][s] for s in positions],
+                                                  decks[d]['template_structure'],
+                                                  [decks[d]['selected_indices'][s] for s in positions])
+                        for d, positions in failed.items()
+                    ))
+                finally:
+                    # This loop ends with asyncio.run, so its pooled connections go with it
+                    await close_async_openai_clients()
+            
+            for (d, positions), retried in zip(failed.items(), asyncio.run(retry_failed())):
+                for s, slide in zip(positions, retried):
+                    results[d][s] = slide
+        
+        return results
+
     @classmethod
     def get_available_models(cls) -> List[str]:
         """Get list of available OpenAI models"""
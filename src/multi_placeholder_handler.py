@@ -4,11 +4,74 @@ Intelligently distributes content across multiple text placeholders on a single
 """
 
 import logging
+import re
 from typing import Dict, List, Any, Optional, Tuple
+from lxml import etree
+from pptx.oxml.ns import qn
 from pptx.slide import Slide
 
 logger = logging.getLogger(__name__)
 
+# Placeholder separator markers ([PLACEHOLDER_2], [NEXT_PLACEHOLDER], [TEXT_AREA 3], ...)
+_PH_RE = re.compile(r'\[(?:NEXT_PLACEHOLDER|PLACEHOLDER[_\s]*\d*|TEXT_AREA[_\s]*\d*)\]', re.IGNORECASE)
+# Start of any placeholder marker, closed or not: such an item begins a new group
+_PH_OPEN_RE = re.compile(r'\[(?:NEXT_)?PLACEHOLDER|\[TEXT_AREA', re.IGNORECASE)
+# Items that are nothing but a group separator
+_HARD_SEPS = frozenset(('---', '###'))
+# Placeholder text that is a static list marker (number, numeral, letter, bullet, dash)
+_STATIC_MARKER_RE = re.compile(r'\d+\.?|[ivxlc]+|[a-zA-Z]\.|•|-|–')
+# Line breaks inside one paragraph's text (written as <a:br/>, like python-pptx does)
+_LINE_BREAK_RE = re.compile('\n|\v')
+# Control characters XML can't hold; escaped as _xHHHH_ like python-pptx's run text setter
+_CTRL_CHAR_RE = re.compile('[\x00-\x08\x0b-\x1f]')
+
+def _escape_ctrl_chars(text: str) -> str:
+    return _CTRL_CHAR_RE.sub(lambda m: '_x%04X_' % ord(m.group()), text)
+
+# Title/subtitle values the LLM uses to mean "leave this placeholder alone"
+_NONE_SENTINELS = frozenset({'none', 'null', '', 'n/a'})
+
+def _bulk_set_paragraphs(text_frame, texts: List[str], reuse_first: bool = True) -> None:
+    """
+    Write texts as level-0 paragraphs straight into a cleared text frame's XML.
+    
+    Produces the same <a:p>/<a:pPr>/<a:r>/<a:br> markup as add_paragraph() plus
+    paragraph.text/level assignments, without python-pptx's per-paragraph proxies.
+    
+    Args:
+        text_frame: Text frame that was just cleared (one empty paragraph left)
+        texts: Paragraph texts, in order
+        reuse_first: Put the first text in the existing first paragraph (keeping its
+            paragraph properties) instead of appending a new one
+    """
+    txBody = text_frame._txBody
+    first = txBody.find(qn('a:p')) if reuse_first else None
+    for k, text in enumerate(texts):
+        if k == 0 and first is not None:
+            p = first
+        else:
+            p = etree.SubElement(txBody, qn('a:p'))
+        
+        pPr = p.find(qn('a:pPr'))
+        if pPr is None:
+            p.insert(0, etree.Element(qn('a:pPr')))
+        else:
+            pPr.attrib.pop('lvl', None)  # level 0 is the default
+        
+        # Runs and breaks go before a trailing <a:endParaRPr>, if any
+        end = p.find(qn('a:endParaRPr'))
+        for n, line in enumerate(_LINE_BREAK_RE.split(text)):
+            elements = [etree.Element(qn('a:br'))] if n else []
+            if line:
+                r = etree.Element(qn('a:r'))
+                etree.SubElement(r, qn('a:t')).text = _escape_ctrl_chars(line)
+                elements.append(r)
+            for element in elements:
+                if end is not None:
+                    end.addprevious(element)
+                else:
+                    p.append(element)
+
 class MultiPlaceholderHandler:
     """Handles content distribution across multiple text placeholders on a slide"""
     
@@ -29,55 +92,33 @@ class MultiPlaceholderHandler:
         if not content_list:
             return [[]]
         
-        # Define all possible separator patterns including numbered variations
-        separator_patterns = [
-            '[NEXT_PLACEHOLDER]', '[PLACEHOLDER]', '[PLACEHOLDER_', 
-            '[TEXT_AREA]', '---', '###'
-        ]
-        
-        # Check for separator markers
         placeholder_groups = [[]]
-        current_group_index = 0
+        append = placeholder_groups[-1].append
         
         for item in content_list:
             if not item:
                 continue
             
-            item_str = str(item)
+            item_str = item if isinstance(item, str) else str(item)
             
-            # Check if this entire item is a separator or contains separator pattern
-            is_separator = False
-            
-            # First check for exact matches or patterns like [PLACEHOLDER_2], [PLACEHOLDER_3] etc.
-            if any(sep in item_str.upper() for sep in ['[PLACEHOLDER', '[NEXT_PLACEHOLDER', '[TEXT_AREA']):
-                is_separator = True
-                # Start a new group
+            # An item containing a placeholder marker (e.g. [PLACEHOLDER_2]) starts a new group
+            if _PH_OPEN_RE.search(item_str):
                 placeholder_groups.append([])
-                current_group_index += 1
-                
-                # Extract any text that's NOT part of the separator marker
-                # Remove all variations of placeholder markers
-                cleaned_text = item_str
-                import re
-                # Remove [PLACEHOLDER_X] patterns
-                cleaned_text = re.sub(r'\[PLACEHOLDER[_\s]*\d*\]', '', cleaned_text, flags=re.IGNORECASE)
-                cleaned_text = re.sub(r'\[NEXT_PLACEHOLDER\]', '', cleaned_text, flags=re.IGNORECASE)
-                cleaned_text = re.sub(r'\[TEXT_AREA[_\s]*\d*\]', '', cleaned_text, flags=re.IGNORECASE)
-                cleaned_text = cleaned_text.strip()
+                append = placeholder_groups[-1].append
                 
-                # If there's remaining text after removing the marker, add it to the new group
+                # Keep any text that's NOT part of the separator marker
+                cleaned_text = _PH_RE.sub('', item_str).strip()
                 if cleaned_text:
-                    placeholder_groups[current_group_index].append(cleaned_text)
+                    append(cleaned_text)
             
             # Check for other separators like ---, ###
-            elif item_str.strip() in ['---', '###']:
-                is_separator = True
+            elif item_str.strip() in _HARD_SEPS:
                 placeholder_groups.append([])
-                current_group_index += 1
+                append = placeholder_groups[-1].append
             
             else:
                 # This is regular content, add to current group
-                placeholder_groups[current_group_index].append(item)
+                append(item)
         
         # Remove empty groups
         placeholder_groups = [group for group in placeholder_groups if group]
@@ -103,8 +144,8 @@ class MultiPlaceholderHandler:
         if not content_list:
             return [[]]
         
-        # Clean content list
-        clean_content = [item for item in content_list if item and str(item).strip()]
+        # Clean content list (items are kept stripped; distribution strips them anyway)
+        clean_content = [text for text in (str(item).strip() if item else '' for item in content_list) if text]
         if not clean_content:
             return [[]]
         
@@ -116,101 +157,95 @@ class MultiPlaceholderHandler:
         if max_placeholders <= 1:
             return [clean_content]
         
-        # Calculate items per placeholder
-        items_per_placeholder = max(1, num_items // max_placeholders)
-        remainder = num_items % max_placeholders
-        
+        # Even contiguous split with extra items going to the first groups; with fewer
+        # items than placeholders every item gets its own group
+        base, extra = divmod(num_items, max_placeholders)
         groups = []
         start_idx = 0
+        for i in range(min(max_placeholders, num_items)):
+            end_idx = start_idx + base + (1 if i < extra else 0)
+            groups.append(clean_content[start_idx:end_idx])
+            start_idx = end_idx
         
-        for i in range(max_placeholders):
-            # Distribute items evenly, with extra items going to first groups
-            items_for_this_group = items_per_placeholder + (1 if i < remainder else 0)
-            
-            if start_idx < num_items:
-                end_idx = min(start_idx + items_for_this_group, num_items)
-                group = clean_content[start_idx:end_idx]
-                if group:  # Only add non-empty groups
-                    groups.append(group)
-                start_idx = end_idx
-        
-        # If we have fewer items than placeholders, create minimal groups
-        if len(groups) < max_placeholders and num_items > 0:
-            # Redistribute to ensure we use more placeholders
-            if num_items >= max_placeholders:
-                # We have enough items, distribute one per placeholder and extras to first
-                groups = []
-                for i in range(min(num_items, max_placeholders)):
-                    groups.append([clean_content[i]])
-                # Add remaining items to existing groups
-                for i in range(max_placeholders, num_items):
-                    groups[i % len(groups)].append(clean_content[i])
-            else:
-                # We have fewer items than placeholders, put one item per group
-                groups = [[item] for item in clean_content]
-        
-        return groups if groups else [[]]
+        return groups
     
     @staticmethod
-    def get_content_placeholders(slide: Slide) -> List[Any]:
+    def _categorize_placeholders(slide: Slide) -> Tuple[Optional[Any], Optional[Any], List[Any]]:
         """
-        Get all real content/body placeholders from a slide (excluding title, subtitle, and static markers like numbers/bullets).
+        Sort a slide's placeholders into title, subtitle and content in one pass over its shapes.
         Args:
             slide: The slide to analyze
         Returns:
-            List of content placeholder shapes (excluding static markers)
+            Tuple of (title shape, subtitle shape, content placeholder shapes). The title is the
+            first placeholder whose type contains TITLE (SUBTITLE included), the subtitle the first
+            SUBTITLE placeholder; content excludes those and static markers like numbers/bullets.
         """
+        title_shape = None
+        subtitle_shape = None
         content_placeholders = []
         title_found = False
         subtitle_found = False
-        static_marker_patterns = [
-            r'^\d+$', r'^\d+\.$', r'^[ivxlc]+$', r'^[a-zA-Z]\.$', r'^•$', r'^-$', r'^–$', r'^\d{2}$'
-        ]
-        import re
         for shape in slide.shapes:
             if not shape.is_placeholder:
                 continue
             try:
                 ph_type = str(shape.placeholder_format.type).upper()
+                if 'SUBTITLE' in ph_type and subtitle_shape is None:
+                    subtitle_shape = shape
                 # Skip title placeholder (only the first one)
                 if 'TITLE' in ph_type and not title_found:
                     title_found = True
+                    title_shape = shape
                     continue
                 # Skip subtitle placeholder (only the first one)
                 if 'SUBTITLE' in ph_type and not subtitle_found:
                     subtitle_found = True
                     continue
+                # Only text placeholders can take content
+                if not shape.has_text_frame:
+                    continue
                 # Exclude static marker placeholders (numbers, bullets, etc.)
-                if shape.has_text_frame:
-                    text = shape.text.strip() if shape.text else ""
-                    if any(re.fullmatch(pat, text) for pat in static_marker_patterns):
-                        logger.debug(f"Skipping static marker placeholder: '{text}'")
-                        continue
+                text = shape.text_frame.text.strip()
+                if _STATIC_MARKER_RE.fullmatch(text):
+                    logger.debug(f"Skipping static marker placeholder: '{text}'")
+                    continue
                 # Collect content/body placeholders
-                if shape.has_text_frame and ('CONTENT' in ph_type or 'BODY' in ph_type or 'TEXT' in ph_type):
-                    content_placeholders.append(shape)
-                elif shape.has_text_frame and 'OBJECT' in ph_type:
+                if 'CONTENT' in ph_type or 'BODY' in ph_type or 'TEXT' in ph_type or 'OBJECT' in ph_type:
                     content_placeholders.append(shape)
             except Exception as e:
                 logger.debug(f"Error checking placeholder type: {e}")
         logger.debug(f"Found {len(content_placeholders)} real content placeholders on slide")
-        return content_placeholders
+        return title_shape, subtitle_shape, content_placeholders
+    
+    @staticmethod
+    def get_content_placeholders(slide: Slide) -> List[Any]:
+        """
+        Get all real content/body placeholders from a slide (excluding title, subtitle, and static markers like numbers/bullets).
+        Args:
+            slide: The slide to analyze
+        Returns:
+            List of content placeholder shapes (excluding static markers)
+        """
+        return MultiPlaceholderHandler._categorize_placeholders(slide)[2]
     
     @staticmethod
-    def distribute_content_to_placeholders(slide: Slide, content_groups: List[List[str]]) -> bool:
+    def distribute_content_to_placeholders(slide: Slide, content_groups: List[List[str]],
+                                           content_placeholders: Optional[List[Any]] = None) -> bool:
         """
         Distribute content groups to available content placeholders.
         
         Args:
             slide: The slide to populate
             content_groups: List of content groups to distribute
+            content_placeholders: The slide's content placeholders, if already looked up
             
         Returns:
             True if content was successfully distributed
         """
         try:
             # Get available content placeholders
-            content_placeholders = MultiPlaceholderHandler.get_content_placeholders(slide)
+            if content_placeholders is None:
+                content_placeholders = MultiPlaceholderHandler.get_content_placeholders(slide)
             
             if not content_placeholders:
                 logger.warning("No content placeholders found on slide")
@@ -233,37 +268,30 @@ class MultiPlaceholderHandler:
                     text_frame = placeholder.text_frame
                     # If the original text is a static marker, preserve it and only add content after
                     orig_text = placeholder.text.strip() if placeholder.text else ""
-                    static_marker_patterns = [
-                        r'^\d+$', r'^\d+\.$', r'^[ivxlc]+$', r'^[a-zA-Z]\.$', r'^•$', r'^-$', r'^–$', r'^\d{2}$'
-                    ]
-                    import re
-                    is_static_marker = any(re.fullmatch(pat, orig_text) for pat in static_marker_patterns)
-                    # Add content items
+                    is_static_marker = _STATIC_MARKER_RE.fullmatch(orig_text) is not None
+                    # Collect the item texts, then write all paragraphs at once
+                    texts = []
+                    reuse_first = False
                     for j, item in enumerate(content_group):
                         if not item or str(item).strip() == "":
                             continue
                         item_text = str(item).strip()
                         
                         # Clean any remaining placeholder markers from the text
-                        import re
-                        item_text = re.sub(r'\[PLACEHOLDER[_\s]*\d*\]', '', item_text, flags=re.IGNORECASE)
-                        item_text = re.sub(r'\[NEXT_PLACEHOLDER\]', '', item_text, flags=re.IGNORECASE)
-                        item_text = re.sub(r'\[TEXT_AREA[_\s]*\d*\]', '', item_text, flags=re.IGNORECASE)
-                        item_text = item_text.strip()
+                        item_text = _PH_RE.sub('', item_text).strip()
                         
                         # Skip if item became empty after cleaning or is a separator
                         if not item_text or item_text in ['---', '###']:
                             continue
-                        if j == 0 and len(text_frame.paragraphs) > 0:
-                            paragraph = text_frame.paragraphs[0]
-                        else:
-                            paragraph = text_frame.add_paragraph()
+                        # Only a first item at index 0 fills the existing first paragraph
+                        if j == 0:
+                            reuse_first = True
                         # If static marker, preserve it and append content
                         if is_static_marker and orig_text:
-                            paragraph.text = f"{orig_text} {item_text}"
+                            texts.append(f"{orig_text} {item_text}")
                         else:
-                            paragraph.text = item_text
-                        paragraph.level = 0  # Bullet level
+                            texts.append(item_text)
+                    _bulk_set_paragraphs(text_frame, texts, reuse_first)
             
             # Clear any remaining empty placeholders
             for i in range(len(content_groups), len(content_placeholders)):
@@ -294,41 +322,38 @@ class MultiPlaceholderHandler:
             True if content was successfully replaced
         """
         try:
-            # Handle title
             title_text = slide_data.get('title')
-            if title_text and title_text.strip() and title_text.lower() != 'none':
-                for shape in slide.shapes:
-                    if shape.is_placeholder:
-                        try:
-                            ph_type = str(shape.placeholder_format.type).upper()
-                            if 'TITLE' in ph_type:
-                                shape.text = title_text
-                                break
-                        except Exception:
-                            continue
+            if not title_text or title_text.strip().lower() in _NONE_SENTINELS:
+                title_text = None
+            subtitle_text = slide_data.get('subtitle')
+            if not subtitle_text or subtitle_text.strip().lower() in _NONE_SENTINELS:
+                subtitle_text = None
+            content_list = slide_data.get('content')
+            if isinstance(content_list, list):
+                content_list = [c for c in content_list if c]
+            else:
+                content_list = None
+            
+            # Nothing to write: leave the slide's shapes untouched
+            if title_text is None and subtitle_text is None and not content_list:
+                return True
+            
+            # One pass over the shapes finds the title, subtitle and content placeholders
+            title_shape, subtitle_shape, content_placeholders = MultiPlaceholderHandler._categorize_placeholders(slide)
+            
+            # Handle title
+            if title_text is not None and title_shape is not None:
+                title_shape.text = title_text
             
             # Handle subtitle (for title slides)
-            subtitle_text = slide_data.get('subtitle')
-            if subtitle_text and subtitle_text.strip() and subtitle_text.lower() != 'none':
-                for shape in slide.shapes:
-                    if shape.is_placeholder:
-                        try:
-                            ph_type = str(shape.placeholder_format.type).upper()
-                            if 'SUBTITLE' in ph_type:
-                                shape.text = subtitle_text
-                                break
-                        except Exception:
-                            continue
+            if subtitle_text is not None and subtitle_shape is not None:
+                subtitle_shape.text = subtitle_text
             
             # Handle content with multi-placeholder awareness
-            content_list = slide_data.get('content', [])
-            if content_list and isinstance(content_list, list):
+            if content_list:
                 # Parse content into groups for multiple placeholders
                 content_groups = MultiPlaceholderHandler.parse_multi_placeholder_content(content_list)
                 
-                # Check how many content placeholders we have
-                content_placeholders = MultiPlaceholderHandler.get_content_placeholders(slide)
-                
                 # If we have multiple placeholders but only one content group, 
                 # try to auto-split the content
                 if len(content_placeholders) > 1 and len(content_groups) == 1:
@@ -339,7 +364,8 @@ class MultiPlaceholderHandler:
                     )
                 
                 # Distribute content to placeholders
-                return MultiPlaceholderHandler.distribute_content_to_placeholders(slide, content_groups)
+                return MultiPlaceholderHandler.distribute_content_to_placeholders(
+                    slide, content_groups, content_placeholders=content_placeholders)
             
             return True
             
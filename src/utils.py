@@ -1,6 +1,7 @@
 import os
 import logging
 import tempfile
+import zipfile
 from typing import Optional, Union
 from pptx import Presentation
 
@@ -38,6 +39,31 @@ def validate_file(file_path: str) -> bool:
         logger.warning(f"File validation failed for {file_path}: {e}")
         return False
 
+def has_pptx_signature(file_path: str) -> bool:
+    """
+    Cheap pre-check that a file looks like an OOXML package, without python-pptx
+    
+    Args:
+        file_path: Path to the file to check
+        
+    Returns:
+        True if the file starts with a zip header and contains [Content_Types].xml
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            head = f.read(4096)
+        if not head.startswith(b'PK\x03\x04'):
+            return False
+        if b'[Content_Types].xml' in head:
+            return True
+        # Office writes [Content_Types].xml first, but other tools may not;
+        # the central directory is still far cheaper than a full package load
+        with zipfile.ZipFile(file_path) as zf:
+            return '[Content_Types].xml' in zf.NameToInfo
+    except (OSError, zipfile.BadZipFile) as e:
+        logger.warning(f"Signature check failed for {file_path}: {e}")
+        return False
+
 def cleanup_temp_files(*file_paths: Optional[str]) -> None:
     """
     Clean up temporary files
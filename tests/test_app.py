@@ -0,0 +1,44 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import uuid
+
+import app
+
+
+class SessionIdTest(unittest.TestCase):
+    def make_session(self, structure):
+        session_id = f"pptgen-{uuid.uuid4()}"
+        session_dir = os.path.join(tempfile.gettempdir(), session_id)
+        os.makedirs(session_dir)
+        self.addCleanup(shutil.rmtree, session_dir, True)
+        with open(os.path.join(session_dir, app.STRUCTURE_FILENAME), 'w', encoding='utf-8') as f:
+            json.dump(structure, f)
+        return session_id
+
+    def test_generated_ids_match(self):
+        self.assertTrue(app._SESSION_ID_RE.match(f"pptgen-{uuid.uuid4()}"))
+
+    def test_rejected_ids(self):
+        valid = f"pptgen-{uuid.uuid4()}"
+        for session_id in ('', 'pptgen-', '../etc', f"../{valid}", f"{valid}/..", f"{valid}\n",
+                           valid.upper(), f"x{valid}", 'pptgen-not-a-uuid'):
+            with self.subTest(session_id=session_id):
+                self.assertIsNone(app._SESSION_ID_RE.match(session_id))
+                self.assertIsNone(app._load_slide_structure(session_id))
+
+    def test_load_saved_structure(self):
+        structure = [{'slide_type': 'title', 'title': 'T', 'subtitle': '', 'content': []}]
+        self.assertEqual(app._load_slide_structure(self.make_session(structure)), structure)
+
+    def test_non_list_structure_is_ignored(self):
+        self.assertIsNone(app._load_slide_structure(self.make_session({'slides': []})))
+
+    def test_missing_structure(self):
+        self.assertIsNone(app._load_slide_structure(f"pptgen-{uuid.uuid4()}"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import itertools
+import random
+import unittest
+
+from src.content_mapper import _solve_assignment
+
+
+def _best_total(scores):
+    """Highest total score over every one-to-one assignment (brute force)"""
+    n, m = len(scores), len(scores[0])
+    if n <= m:
+        return max(sum(scores[i][c] for i, c in enumerate(cols))
+                   for cols in itertools.permutations(range(m), n))
+    return max(sum(scores[r][j] for j, r in enumerate(rows))
+               for rows in itertools.permutations(range(n), m))
+
+
+class SolveAssignmentTest(unittest.TestCase):
+    def assert_optimal(self, scores):
+        assignment = _solve_assignment(scores)
+        self.assertEqual(len(assignment), min(len(scores), len(scores[0])))
+        self.assertEqual(len(set(assignment.values())), len(assignment))
+        total = sum(scores[row][col] for row, col in assignment.items())
+        self.assertEqual(total, _best_total(scores))
+
+    def test_empty(self):
+        self.assertEqual(_solve_assignment([]), {})
+        self.assertEqual(_solve_assignment([[]]), {})
+
+    def test_beats_greedy(self):
+        # Greedy row-by-row would give row 0 column 0 (10) and row 1 column 1 (1)
+        scores = [[10, 9], [8, 1]]
+        self.assertEqual(_solve_assignment(scores), {0: 1, 1: 0})
+
+    def test_negative_scores(self):
+        self.assert_optimal([[-5, -1], [-2, -8]])
+
+    def test_random_square_and_rectangular(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            n, m = rng.randint(1, 5), rng.randint(1, 5)
+            scores = [[rng.randint(-20, 20) for _ in range(m)] for _ in range(n)]
+            with self.subTest(scores=scores):
+                self.assert_optimal(scores)
+
+
+if __name__ == '__main__':
+    unittest.main()
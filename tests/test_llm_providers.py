@@ -0,0 +1,120 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from src import llm_providers
+from src.llm_providers import BaseLLMProvider, _iter_json_objects, _sentence_chunks
+
+
+def _chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class IterJsonObjectsTest(unittest.TestCase):
+    TEXT = ('Here is the deck:\n```json\n[{"title": "A [draft]", "content": ["x", "y]"]},\n'
+            ' {"title": "Quote \\" and {brace}", "content": []}, {"nested": {"a": [1, {"b": 2}]}}]\n```')
+    EXPECTED = [
+        '{"title": "A [draft]", "content": ["x", "y]"]}',
+        '{"title": "Quote \\" and {brace}", "content": []}',
+        '{"nested": {"a": [1, {"b": 2}]}}',
+    ]
+
+    def test_any_chunking(self):
+        for size in (1, 2, 3, 7, 16, len(self.TEXT)):
+            with self.subTest(size=size):
+                self.assertEqual(list(_iter_json_objects(_chunks(self.TEXT, size))), self.EXPECTED)
+
+    def test_stops_at_array_end(self):
+        self.assertEqual(list(_iter_json_objects(['[{"a": 1}] trailing [{"b": 2}]'])), ['{"a": 1}'])
+
+    def test_no_array(self):
+        self.assertEqual(list(_iter_json_objects(['no json here'])), [])
+
+    def test_incomplete_object_is_not_yielded(self):
+        self.assertEqual(list(_iter_json_objects(['[{"a": 1}, {"b": '])), ['{"a": 1}'])
+
+
+class SentenceChunksTest(unittest.TestCase):
+    def test_decimals_and_ellipses_are_not_boundaries(self):
+        text = '...Growth was 3.5% this year. Why? Costs fell!  Margins rose. Done'
+        self.assertEqual(_sentence_chunks(text), ['...Growth was 3.5% this year. Why? Costs fell!', 'Margins rose. Done'])
+
+    def test_limit(self):
+        self.assertEqual(len(_sentence_chunks('A. ' * 40)), 10)
+
+    def test_empty(self):
+        self.assertEqual(_sentence_chunks(''), [''])
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        for name, value in (('LLM_RESPONSE_CACHE_DIR', self.tmp.name), ('LLM_CACHE_MODE', 'exact'),
+                            ('LLM_CACHE_MAX_TEMPERATURE', 0.3), ('_last_cache_prune', time.time())):
+            patcher = mock.patch.object(llm_providers, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        llm_providers._memory_cache.clear()
+        self.addCleanup(llm_providers._memory_cache.clear)
+        self.provider = BaseLLMProvider('key', 'model-a')
+
+    def test_round_trip(self):
+        self.provider._cache_put('prompt', 'response', temperature=0.2)
+        self.assertEqual(self.provider._cache_get('prompt', temperature=0.2), 'response')
+        llm_providers._memory_cache.clear()
+        self.assertEqual(self.provider._cache_get('prompt', temperature=0.2), 'response')
+
+    def test_key_is_case_and_model_sensitive(self):
+        self.assertNotEqual(self.provider._cache_key('Prompt'), self.provider._cache_key('prompt'))
+        self.assertNotEqual(self.provider._cache_key('prompt'), BaseLLMProvider('key', 'model-b')._cache_key('prompt'))
+        self.provider._cache_put('prompt', 'response', temperature=0.2)
+        self.assertIsNone(self.provider._cache_get('Prompt', temperature=0.2))
+
+    def test_key_is_provider_sensitive(self):
+        class OtherProvider(BaseLLMProvider):
+            pass
+        self.provider._cache_put('prompt', 'response', temperature=0.2)
+        self.assertIsNone(OtherProvider('key', 'model-a')._cache_get('prompt', temperature=0.2))
+
+    def test_key_is_api_key_scoped(self):
+        self.provider._cache_put('prompt', 'response', temperature=0.2)
+        self.assertIsNone(BaseLLMProvider('other-key', 'model-a')._cache_get('prompt', temperature=0.2))
+
+    def test_temperature_gate(self):
+        self.provider._cache_put('prompt', 'sampled', temperature=0.7)
+        self.assertIsNone(self.provider._cache_get('prompt', temperature=0.2))
+        self.provider._cache_put('prompt', 'response', temperature=0.2)
+        self.assertIsNone(self.provider._cache_get('prompt', temperature=0.7))
+        self.assertIsNone(self.provider._cache_get('prompt'))  # model-default temperature
+
+    def test_off_mode(self):
+        with mock.patch.object(llm_providers, 'LLM_CACHE_MODE', 'off'):
+            self.provider._cache_put('prompt', 'response', temperature=0.0)
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_ttl_expiry(self):
+        self.provider._cache_put('prompt', 'response', temperature=0.2)
+        llm_providers._memory_cache.clear()
+        path = os.path.join(self.tmp.name, f"{self.provider._cache_key('prompt')}.txt")
+        stale = time.time() - llm_providers.LLM_RESPONSE_CACHE_TTL - 10
+        os.utime(path, (stale, stale))
+        self.assertIsNone(self.provider._cache_get('prompt', temperature=0.2))
+
+    def test_prune_removes_expired_then_oldest(self):
+        now = time.time()
+        ages = {'expired.txt': llm_providers.LLM_RESPONSE_CACHE_TTL + 10, 'old.txt': 30, 'mid.txt': 20, 'new.txt': 10}
+        for name, age in ages.items():
+            path = os.path.join(self.tmp.name, name)
+            with open(path, 'w') as f:
+                f.write('x' * 100)
+            os.utime(path, (now - age, now - age))
+        with mock.patch.object(llm_providers, 'LLM_RESPONSE_CACHE_MAX_BYTES', 250):
+            llm_providers.prune_response_cache(now)
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ['mid.txt', 'new.txt'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+import zipfile
+
+from src.utils import has_pptx_signature
+
+
+class HasPptxSignatureTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def make_zip(self, name, members):
+        path = self.path(name)
+        with zipfile.ZipFile(path, 'w') as zf:
+            for member in members:
+                zf.writestr(member, b'<xml/>')
+        return path
+
+    def test_content_types_first(self):
+        self.assertTrue(has_pptx_signature(self.make_zip('a.pptx', ['[Content_Types].xml', 'ppt/presentation.xml'])))
+
+    def test_content_types_past_first_block(self):
+        # Pushed beyond the first 4 KiB, so only the central directory finds it
+        members = ['ppt/slides/slide%d.xml' % i for i in range(200)] + ['[Content_Types].xml']
+        self.assertTrue(has_pptx_signature(self.make_zip('b.pptx', members)))
+
+    def test_zip_without_content_types(self):
+        self.assertFalse(has_pptx_signature(self.make_zip('c.pptx', ['ppt/presentation.xml'])))
+
+    def test_not_a_zip(self):
+        path = self.path('d.pptx')
+        with open(path, 'wb') as f:
+            f.write(b'%PDF-1.7 not a presentation')
+        self.assertFalse(has_pptx_signature(path))
+
+    def test_truncated_zip(self):
+        path = self.path('e.pptx')
+        with open(path, 'wb') as f:
+            f.write(b'PK\x03\x04' + b'\x00' * 64)
+        self.assertFalse(has_pptx_signature(path))
+
+    def test_missing_file(self):
+        self.assertFalse(has_pptx_signature(self.path('missing.pptx')))
+
+
+if __name__ == '__main__':
+    unittest.main()